@@ -2,19 +2,49 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+from startup import StartupTimer
+startup = StartupTimer()
+
+import os
 import json
+import csv
+import io
+import time
+from functools import wraps, lru_cache
+import base64
+from itertools import groupby
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+from datetime import date, datetime, timedelta
+from flask import Flask, render_template, request, Response, flash, get_flashed_messages, redirect, url_for, abort, g, make_response, stream_with_context, jsonify
+from flask.cli import AppGroup
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import is_resource_modified
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.exc import StaleDataError
+from markupsafe import Markup
+import click
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+from search import NgramIndex, PrefixIndex
+from matching import MatchIndex
+from cache import LRUCache, SQLiteCache
+from importer import read_rows, batches, RejectWriter, ImportStats, allocate_ids, copy_rows, upsert_rows
+from dates import CompiledDateFormat
+from querystats import init_query_stats
+from jsonlog import init_logging
+from assets import Assets
+from replicas import RoutingSQLAlchemy
 from flask_migrate import Migrate
 from flask_wtf import CsrfProtect
+from flask_wtf.csrf import generate_csrf
+from jinja2 import FileSystemBytecodeCache
 
+startup.mark('import')
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -24,9 +54,14 @@ app = Flask(__name__)
 csrf = CsrfProtect()
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app)
 csrf.init_app(app)
 migrate = Migrate(app,db)
+init_query_stats(app)
+assets = Assets(app)
+if app.config.get('JINJA_BYTECODE_CACHE_DIR'):
+  os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+  app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
 # TODO: connect to a local postgresql database
 
 #----------------------------------------------------------------------------#
@@ -39,7 +74,49 @@ class Show(db.Model):
     start_time = db.Column(db.DateTime,primary_key=True)
     artist = db.relationship("Artist", back_populates="show_artist")
     venue = db.relationship("Venue", back_populates="show_venue")
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_venue_id_artist_id', 'start_time', 'venue_id', 'artist_id'),
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
+
+# on PostgreSQL `show` is split into monthly partitions (see
+# create_show_partitions); rows outside them land in the default partition
+event.listen(Show.__table__, 'after_create', db.DDL(
+    'CREATE TABLE show_default PARTITION OF show DEFAULT').execute_if(dialect='postgresql'))
+
+
+venue_genre = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
 
+artist_genre = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+def genres_named(names):
+    # existing Genre rows for `names` in one query, new ones for the rest
+    names = [name for name in dict.fromkeys(names) if name]
+    if not names:
+        return []
+    existing = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+    created = [Genre(name=name) for name in names if name not in existing]
+    # pending genres are autoflushed by the next lookup, so later rows in
+    # the same transaction find them instead of inserting duplicates
+    db.session.add_all(created)
+    existing.update((genre.name, genre) for genre in created)
+    return [existing[name] for name in names]
 
 class Venue(db.Model):
     __tablename__ = 'venue'
@@ -50,13 +127,32 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.String(10))
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # bumped whenever the entity's page changes (see bump_versions)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=db.func.now())
+    # bumped only by edits of the row itself, which compare-and-swap on it
+    # (see save_edit)
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': row_version, 'version_id_generator': False}
     show_venue = db.relationship('Show',back_populates="venue")
+    genre_items = db.relationship('Genre', secondary=venue_genre, order_by=Genre.name)
+    __table_args__ = (
+        db.Index('ix_venue_city_state_id', 'city', 'state', 'id'),
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+    @property
+    def genres(self):
+        return [genre.name for genre in self.genre_items]
+
+    @genres.setter
+    def genres(self, names):
+        self.genre_items = genres_named(names)
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Artist(db.Model):
@@ -67,71 +163,1240 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     seeking_venue = db.Column(db.String(10))
     seeking_description = db.Column(db.String(500))
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # bumped whenever the entity's page changes (see bump_versions)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=db.func.now())
+    # bumped only by edits of the row itself, which compare-and-swap on it
+    # (see save_edit)
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': row_version, 'version_id_generator': False}
     show_artist = db.relationship('Show', back_populates="artist")
+    genre_items = db.relationship('Genre', secondary=artist_genre, order_by=Genre.name)
+    __table_args__ = (
+        db.Index('ix_artist_city_state', 'city', 'state'),
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+    @property
+    def genres(self):
+        return [genre.name for genre in self.genre_items]
+
+    @genres.setter
+    def genres(self, names):
+        self.genre_items = genres_named(names)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+class VenueShowSummary(db.Model):
+    __tablename__ = 'venue_show_summary'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+
+class ArtistShowSummary(db.Model):
+    __tablename__ = 'artist_show_summary'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+
+class ShowArchive(db.Model):
+    # shows older than SHOW_ARCHIVE_AFTER_DAYS, moved out of `show` by archive_shows
+    __tablename__ = 'show_archive'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    start_time = db.Column(db.DateTime, primary_key=True)
+    __table_args__ = (
+        db.Index('ix_show_archive_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_archive_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_archive_start_time_venue_id_artist_id', 'start_time', 'venue_id', 'artist_id'),
+    )
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=64)
+def compile_datetime_format(format, locale=None, tz=None):
+  return CompiledDateFormat(DATETIME_FORMATS.get(format, format), locale, tz)
+
+def format_datetime(value, format='medium', locale=None, tz=None):
   if isinstance(value, str):
-    date = dateutil.parser.parse(value)
-  else:
-    date = value
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+    value = dateutil.parser.parse(value)
+  if format in ('long', 'short'):
+    tzinfo = babel.dates.get_timezone(tz) if tz else None
+    return babel.dates.format_datetime(value, format, tzinfo=tzinfo, locale=locale or babel.dates.LC_TIME)
+  return compile_datetime_format(format, locale, tz)(value)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+def show_timeline(key_column, key, counterpart, prefix, limit=None):
+  # upcoming shows and the latest `limit` past ones for one venue or artist,
+  # joined to the other side and served by the (venue_id|artist_id,
+  # start_time) indexes; the archive is only read when the hot table runs
+  # short of past shows
+  now = datetime.now()
+  limit = limit or app.config['SHOW_HISTORY_LIMIT']
+
+  def timeline(model, *criteria):
+    return db.session.query(
+        model.start_time, counterpart.id, counterpart.name, counterpart.image_link
+      ).join(counterpart, counterpart.id == getattr(model, prefix + '_id')
+      ).filter(getattr(model, key_column.key) == key, *criteria)
+
+  upcoming = timeline(Show, Show.start_time > now).order_by(Show.start_time).all()
+  past = timeline(Show, Show.start_time < now).order_by(Show.start_time.desc()).limit(limit).all()
+  if len(past) < limit:
+    past += timeline(ShowArchive).order_by(ShowArchive.start_time.desc()).limit(limit - len(past)).all()
+
+  def shows(results):
+    return [{
+      prefix + "_id": result.id,
+      prefix + "_name": result.name,
+      prefix + "_image_link": result.image_link,
+      "start_time": result.start_time
+    } for result in results]
+  return shows(past), shows(upcoming)
+
+def venue_timeline(venue_id):
+  return show_timeline(Show.venue_id, venue_id, Artist, 'artist')
+
+def artist_timeline(artist_id):
+  return show_timeline(Show.artist_id, artist_id, Venue, 'venue')
+
+def show_listing():
+  # the columns a show tile renders, with its venue and artist joined in;
+  # rows are plain tuples, so nothing goes through the identity map
+  return db.session.query(
+      Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+      Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue
+    ).join(Artist, Show.artist)
+
+def browse(model, link_table, seeking_column, genre=None, city=None, state=None, seeking=False):
+  # filters on (city, state) and the genre link indexes; genre counts are
+  # computed over the same filters minus the genre itself
+  link_key = link_table.c[model.__tablename__ + '_id']
+  results = db.session.query(model.id, model.name, model.city, model.state)
+  counts = db.session.query(Genre.name, db.func.count(link_key)
+    ).join(link_table, link_table.c.genre_id == Genre.id
+    ).join(model, model.id == link_key)
+  for column, value in ((model.city, city), (model.state, state)):
+    if value:
+      results = results.filter(column == value)
+      counts = counts.filter(column == value)
+  if seeking:
+    results = results.filter(seeking_column == 'True')
+    counts = counts.filter(seeking_column == 'True')
+  if genre:
+    results = results.join(link_table, link_key == model.id
+      ).join(Genre, Genre.id == link_table.c.genre_id
+      ).filter(Genre.name == genre)
+
+  results = results.order_by(model.name, model.id).limit(app.config['SEARCH_RESULT_LIMIT']).all()
+  counts = counts.group_by(Genre.name).order_by(Genre.name).all()
+  return results, counts
+
+def calendar_query(start, end, city=None, state=None, genre=None, venue_id=None, artist_id=None):
+  # shows starting in [start, end) with their venue and artist; walked in
+  # (start_time, venue_id, artist_id) order so the start_time index serves
+  # the range and a page stops reading after PAGE_SIZE matches. Archived
+  # shows are added with UNION ALL when the range starts before the newest
+  # of them.
+  def shows(model):
+    query = db.session.query(
+        model.start_time, model.venue_id, Venue.name.label('venue_name'), Venue.city, Venue.state,
+        model.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+      ).join(Venue, Venue.id == model.venue_id
+      ).join(Artist, Artist.id == model.artist_id
+      ).filter(model.start_time >= start, model.start_time < end)
+    for column, value in ((Venue.city, city), (Venue.state, state), (model.venue_id, venue_id), (model.artist_id, artist_id)):
+      if value:
+        query = query.filter(column == value)
+    if genre:
+      # a correlated EXISTS keeps the range scan driving instead of every
+      # show of every artist in the genre
+      query = query.filter(db.exists().where(db.and_(
+        artist_genre.c.artist_id == model.artist_id,
+        artist_genre.c.genre_id == Genre.id,
+        Genre.name == genre)))
+    return query
+
+  query = shows(Show)
+  archived_until = db.session.query(db.func.max(ShowArchive.start_time)).scalar()
+  if archived_until is not None and archived_until >= datetime.combine(start, datetime.min.time()):
+    query = query.union_all(shows(ShowArchive))
+  return query
+
+def encode_cursor(values):
+  data = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+  return base64.urlsafe_b64encode(data.encode()).decode()
+
+def decode_cursor(cursor, columns):
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if len(values) != len(columns):
+      raise ValueError(cursor)
+    return [datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, values)]
+  except (ValueError, TypeError):
+    abort(400)
+
+def keyset_page(query, columns, per_page=None):
+  # one page of `query` ordered by `columns`, positioned by the opaque
+  # ?after= / ?before= cursors so deep pages cost the same as the first
+  per_page = per_page or app.config['PAGE_SIZE']
+  key = db.tuple_(*columns)
+  after = request.args.get('after')
+  before = request.args.get('before')
+
+  if before:
+    query = query.filter(key < db.tuple_(*decode_cursor(before, columns)))
+    rows = query.order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+    has_prev, has_next = len(rows) > per_page, True
+    rows = rows[:per_page][::-1]
+  else:
+    if after:
+      query = query.filter(key > db.tuple_(*decode_cursor(after, columns)))
+    rows = query.order_by(*columns).limit(per_page + 1).all()
+    has_prev, has_next = bool(after), len(rows) > per_page
+    rows = rows[:per_page]
+
+  page = {"prev": None, "next": None}
+  if rows and has_prev:
+    page["prev"] = encode_cursor([getattr(rows[0], column.key) for column in columns])
+  if rows and has_next:
+    page["next"] = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+  return rows, page
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# The search, typeahead and matchmaking indexes are per process. Each one
+# remembers the page cache's last invalidation of its table at the time it
+# was built (`seen`), and is rebuilt when a later one has been recorded;
+# with PAGE_CACHE_PATH the cache is shared, so that includes writes made
+# by other workers and by `flask fyyur import`. This process's own writes
+# are applied in place once they commit, and dropped if they roll back.
+
+def current_index(indexes, model, build):
+  table = model.__tablename__
+  seen = page_cache.last_invalidated(table)
+  index = indexes.get(model)
+  if index is None or index.seen < seen:
+    read_primary_if_written((table,))
+    index = build(model)
+    index.seen = seen
+    indexes[model] = index
+  return index
+
+def defer_index_change(session, indexes, model, change):
+  # `change(index)` runs on this process's index of `model` after the
+  # session commits
+  session.info.setdefault('index_changes', []).append((indexes, model, change))
+
+def apply_index_changes(changes, invalidated_at, previous):
+  # an index that had seen every invalidation of its table before this
+  # commit takes the commit's changes and is current as of it; any other
+  # is rebuilt on its next use
+  for indexes, model, change in changes:
+    index = indexes.get(model)
+    table = model.__tablename__
+    if index is not None and table in previous and index.seen >= previous[table]:
+      change(index)
+      index.seen = invalidated_at
+
+# per-process n-gram indexes used when the database has no pg_trgm,
+# built on the first search and kept current as described above
+search_indexes = {}
+
+def build_search_index(model):
+  index = NgramIndex()
+  for key, name in db.session.query(model.id, model.name):
+    index.add(key, name)
+  return index
+
+def search_index(model):
+  return current_index(search_indexes, model, build_search_index)
+
+def search_names(model, term, limit=None):
+  # case-insensitive substring search on name, best matches first
+  limit = limit or app.config['SEARCH_RESULT_LIMIT']
+  if db.engine.dialect.name == 'postgresql':
+    pattern = '%{}%'.format(term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    return db.session.query(model.id, model.name
+      ).filter(model.name.ilike(pattern, escape='\\')
+      ).order_by(db.func.similarity(model.name, term).desc(), model.name
+      ).limit(limit).all()
+
+  keys = search_index(model).search(term, limit)
+  results = {row.id: row for row in db.session.query(model.id, model.name).filter(model.id.in_(keys))}
+  return [results[key] for key in keys if key in results]
+
+# per-process sorted name arrays behind the typeahead endpoints, built at
+# startup (or on first use); see current_index for how they follow writes
+prefix_indexes = {}
+
+def build_prefix_index(model):
+  index = PrefixIndex()
+  index.add_all(db.session.query(model.id, model.name))
+  return index
+
+def prefix_index(model):
+  return current_index(prefix_indexes, model, build_prefix_index)
+
+def autocomplete_names(model, prefix, limit=None):
+  # names starting with `prefix`, or with a word starting with it; served
+  # from memory without a query
+  limit = min(limit or app.config['AUTOCOMPLETE_LIMIT'], app.config['AUTOCOMPLETE_LIMIT'])
+  return prefix_index(model).complete(prefix, limit)
+
+def autocomplete_response(model):
+  results = autocomplete_names(model, request.args.get('q', ''), request.args.get('limit', type=int))
+  data = [{"id": key, "name": name} for key, name in results]
+  return jsonify({"count": len(data), "data": data})
+
+def build_name_indexes():
+  # run at import, before a preforking server forks its workers; the pooled
+  # connection is dropped afterwards so that no two workers share it
+  with app.app_context():
+    try:
+      for model in (Venue, Artist):
+        prefix_index(model)
+    finally:
+      db.session.remove()
+      db.engine.dispose()
+
+def index_name(mapper, connection, target):
+  key, name = target.id, target.name
+  for indexes in (search_indexes, prefix_indexes):
+    defer_index_change(object_session(target), indexes, type(target), lambda index: index.add(key, name))
+
+def unindex_name(mapper, connection, target):
+  forget_name(type(target), target.id, object_session(target))
+
+def forget_name(model, key, session=None):
+  # also called by the delete views, before their commit, since bulk
+  # deletes skip mapper events
+  for indexes in (search_indexes, prefix_indexes):
+    defer_index_change(session or db.session, indexes, model, lambda index: index.remove(key))
+
+for model in (Venue, Artist):
+  event.listen(model, 'after_insert', index_name)
+  event.listen(model, 'after_update', index_name)
+  event.listen(model, 'after_delete', unindex_name)
+
+#----------------------------------------------------------------------------#
+# Entity versions.
+#----------------------------------------------------------------------------#
+
+# a venue or artist page shows the entity, its shows and the names and
+# images of the artists or venues it has shows with; Venue.version and
+# Artist.version count changes to any of those, and back the ETags of the
+# JSON pages
+
+# the entity each Show key column points at, and the other side of its shows
+SHOW_ENTITIES = {'venue_id': Venue, 'artist_id': Artist}
+COUNTERPARTS = {Venue: (Artist, 'venue_id', 'artist_id'), Artist: (Venue, 'artist_id', 'venue_id')}
+
+def bump_versions(connection, model, keys):
+  keys = list(keys)
+  if keys:
+    connection.execute(model.__table__.update().where(model.id.in_(keys)).values(
+      version=model.version + 1, updated_at=datetime.utcnow()))
+
+def version_edited(mapper, connection, target):
+  # the UPDATE only matches the row_version loaded with the entity, and
+  # raises StaleDataError when a concurrent edit has bumped it; `version`
+  # also moves with show changes, so it is bumped in SQL instead
+  if object_session(target).is_modified(target):
+    target.version = type(target).version + 1
+    target.row_version = target.row_version + 1
+    target.updated_at = datetime.utcnow()
+
+def version_counterparts(mapper, connection, target):
+  # a rename or new image shows up on the pages of the other side
+  state = db.inspect(target)
+  if not any(state.attrs[name].history.has_changes() for name in ('name', 'image_link')):
+    return
+  counterpart, own_key, other_key = COUNTERPARTS[type(target)]
+  keys = set()
+  for model in (Show, ShowArchive):
+    keys.update(key for key, in connection.execute(db.session.query(getattr(model, other_key)
+      ).filter(getattr(model, own_key) == target.id).distinct().statement))
+  bump_versions(connection, counterpart, keys)
+
+for model in (Venue, Artist):
+  event.listen(model, 'before_update', version_edited)
+  event.listen(model, 'after_update', version_counterparts)
+
+def apply_changes(entity, form):
+  # sets only the fields whose submitted value differs from the stored one,
+  # so the UPDATE lists just those columns; empty and NULL count as equal.
+  # assigning genres looks them up, and an autoflush there would write the
+  # fields set so far in an UPDATE of their own
+  changed = []
+  with db.session.no_autoflush:
+    for field in form:
+      if not hasattr(type(entity), field.name):
+        continue
+      current = getattr(entity, field.name)
+      if field.name == 'genres':
+        differs = set(field.data) != set(current)
+      else:
+        differs = (field.data or None) != (current or None)
+      if differs:
+        setattr(entity, field.name, field.data)
+        changed.append(field.name)
+  return changed
+
+def save_edit(entity, form):
+  # commits the form's changes to `entity` unless it has been edited since
+  # the form was loaded, whose row_version is posted back; returns False on
+  # a conflict, with the session rolled back. A post without a row_version
+  # counts as one, so nothing is saved without the check
+  expected = request.form.get('row_version', type=int)
+  if expected is None or expected != entity.row_version:
+    db.session.rollback()
+    return False
+  apply_changes(entity, form)
+  try:
+    db.session.commit()
+  except StaleDataError:
+    db.session.rollback()
+    return False
+  return True
+
+def edit_conflict(template_name, form, **context):
+  # the edit form again with the submitted values and the current
+  # row_version, so submitting it once more is a deliberate overwrite
+  return render_template(template_name, form=form, conflict=True, **context), 409
+
+#----------------------------------------------------------------------------#
+# Matchmaking.
+#----------------------------------------------------------------------------#
+
+# per-process indexes of the venues seeking talent and the artists seeking
+# venues, built on first use and kept current like the name indexes (see
+# current_index); a venue page suggests artists from them and an artist
+# page venues
+match_indexes = {}
+MATCH_PROFILES = {Venue: (Venue.seeking_talent, venue_genre), Artist: (Artist.seeking_venue, artist_genre)}
+
+def genre_links(model, keys=None):
+  seeking, link_table = MATCH_PROFILES[model]
+  link_key = link_table.c[model.__tablename__ + '_id']
+  query = db.session.query(link_key, Genre.name
+    ).select_from(link_table
+    ).join(Genre, Genre.id == link_table.c.genre_id)
+  if keys is not None:
+    query = query.filter(link_key.in_(keys))
+  return query
+
+def build_match_index(model):
+  index = MatchIndex()
+  seeking, _ = MATCH_PROFILES[model]
+  genres = {}
+  for key, name in genre_links(model):
+    genres.setdefault(key, []).append(name)
+  for key, city, state in db.session.query(model.id, model.city, model.state).filter(seeking == 'True'):
+    index.add(key, city, state, genres.get(key, ()))
+  return index
+
+def match_index(model):
+  return current_index(match_indexes, model, build_match_index)
+
+def suggest_matches(model, entity, limit=None):
+  # counterparts open to bookings, ranked by location, shared genres and
+  # past shows together; only the postings the entity shares are scored
+  limit = limit or app.config['MATCH_SUGGESTION_LIMIT']
+  counterpart, own_key, other_key = COUNTERPARTS[model]
+  cobooked = {}
+  for show_model in (Show, ShowArchive):
+    other_column = getattr(show_model, other_key)
+    for key, count in db.session.query(other_column, db.func.count()
+        ).filter(getattr(show_model, own_key) == entity.id
+        ).group_by(other_column):
+      cobooked[key] = cobooked.get(key, 0) + count
+
+  matches = match_index(counterpart).suggest(entity.city, entity.state, entity.genres, cobooked, limit)
+  if not matches:
+    return []
+  rows = {row.id: row for row in db.session.query(
+      counterpart.id, counterpart.name, counterpart.city, counterpart.state, counterpart.image_link
+    ).filter(counterpart.id.in_([key for key, score in matches]))}
+  # bulk deletes skip the mapper events, so stale keys are dropped here
+  return [{
+    "id": key,
+    "name": rows[key].name,
+    "city": rows[key].city,
+    "state": rows[key].state,
+    "image_link": rows[key].image_link,
+    "score": score,
+    "past_shows_together": cobooked.get(key, 0)
+  } for key, score in matches if key in rows]
+
+def index_match(mapper, connection, target):
+  # the profile is read now, at flush, and applied once the session commits
+  model, key = type(target), target.id
+  if match_indexes.get(model) is None:
+    return
+  seeking, _ = MATCH_PROFILES[model]
+  if getattr(target, seeking.key) != 'True':
+    defer_index_change(object_session(target), match_indexes, model, lambda index: index.remove(key))
+    return
+  if 'genre_items' in db.inspect(target).unloaded:
+    # not assigned in this flush, so the stored links are current
+    genres = [name for link_key, name in connection.execute(genre_links(model, [key]).statement)]
+  else:
+    genres = target.genres
+  city, state = target.city, target.state
+  defer_index_change(object_session(target), match_indexes, model, lambda index: index.add(key, city, state, genres))
+
+def unindex_match(mapper, connection, target):
+  key = target.id
+  defer_index_change(object_session(target), match_indexes, type(target), lambda index: index.remove(key))
+
+for model in (Venue, Artist):
+  event.listen(model, 'after_insert', index_match)
+  event.listen(model, 'after_update', index_match)
+  event.listen(model, 'after_delete', unindex_match)
+
+#----------------------------------------------------------------------------#
+# Show summaries.
+#----------------------------------------------------------------------------#
+
+# (summary model, its key column, the matching Show column)
+SHOW_SUMMARIES = (
+  (VenueShowSummary, VenueShowSummary.venue_id, Show.venue_id),
+  (ArtistShowSummary, ArtistShowSummary.artist_id, Show.artist_id),
+)
+
+def adjust_show_summary(connection, show, delta):
+  # applied inside the flush, so the summary moves in the same transaction
+  # as the show insert or delete; the count moves relative to the stored
+  # row in one upsert, so concurrent bookings add up instead of one
+  # overwriting the other
+  now = datetime.now()
+  upcoming = show.start_time > now
+  count = 'upcoming_shows_count' if upcoming else 'past_shows_count'
+  for model, key_column, show_column in SHOW_SUMMARIES:
+    table = model.__table__
+    key = getattr(show, show_column.key)
+    values = {key_column.key: key, 'upcoming_shows_count': 0, 'past_shows_count': 0, 'next_show_time': None}
+    values[count] = max(delta, 0)
+    update = {count: table.c[count] + delta}
+    if upcoming:
+      # the show row is already inserted or deleted, so this sees it
+      values['next_show_time'] = update['next_show_time'] = db.session.query(db.func.min(Show.start_time)
+        ).filter(show_column == key, Show.start_time > now).scalar_subquery()
+    upsert_rows(connection, table, [values], [key_column.key], update)
+    bump_versions(connection, SHOW_ENTITIES[show_column.key], [key])
+
+@event.listens_for(Show, 'after_insert')
+def show_inserted(mapper, connection, target):
+  adjust_show_summary(connection, target, 1)
+
+@event.listens_for(Show, 'after_delete')
+def show_deleted(mapper, connection, target):
+  adjust_show_summary(connection, target, -1)
+
+def refresh_show_summary(model, key_column, show_column, keys=None, now=None):
+  # recomputes summaries from the show and show_archive tables, for every
+  # entity or only `keys`
+  now = now or datetime.now()
+  archive_column = getattr(ShowArchive, show_column.key)
+  upcoming = db.session.query(show_column, db.func.count(), db.func.min(Show.start_time)
+    ).filter(Show.start_time > now)
+  total = db.session.query(show_column, db.func.count())
+  archived = db.session.query(archive_column, db.func.count())
+  if keys is not None:
+    upcoming = upcoming.filter(show_column.in_(keys))
+    total = total.filter(show_column.in_(keys))
+    archived = archived.filter(archive_column.in_(keys))
+  upcoming = {key: (count, next_show_time) for key, count, next_show_time in upcoming.group_by(show_column)}
+  total = dict(total.group_by(show_column).all())
+  archived = dict(archived.group_by(archive_column).all())
+
+  # sorted, so concurrent refreshes lock the summary rows in the same order
+  keys = sorted(set(total) | set(archived) if keys is None else keys)
+  rows = []
+  for key in keys:
+    upcoming_count, next_show_time = upcoming.get(key, (0, None))
+    rows.append({
+      key_column.key: key,
+      'upcoming_shows_count': upcoming_count,
+      'past_shows_count': total.get(key, 0) - upcoming_count + archived.get(key, 0),
+      'next_show_time': next_show_time,
+    })
+  if keys:
+    # updated in place rather than deleted and inserted again, so a
+    # concurrent refresh of the same keys waits on the rows instead of
+    # failing on a duplicate key
+    upsert_rows(db.session.connection(), model.__table__, rows, [key_column.key])
+    bump_versions(db.session.connection(), SHOW_ENTITIES[show_column.key], keys)
+  return len(keys)
+
+def rollover_show_summary(now=None):
+  # moves shows that have started since the last run from upcoming to past;
+  # only entities whose next show is due are recomputed
+  now = now or datetime.now()
+  refreshed = 0
+  for model, key_column, show_column in SHOW_SUMMARIES:
+    keys = [key for key, in db.session.query(key_column).filter(model.next_show_time <= now)]
+    if keys:
+      refreshed += refresh_show_summary(model, key_column, show_column, keys, now)
+  db.session.commit()
+  return refreshed
+
+def rebuild_show_summary():
+  for model, key_column, show_column in SHOW_SUMMARIES:
+    model.query.delete()
+    refresh_show_summary(model, key_column, show_column)
+  db.session.commit()
+
+def insert_shows(keys):
+  # bulk insert of (venue_id, artist_id, start_time) keys; this skips the
+  # mapper events, so the touched summaries are refreshed here instead
+  keys = list(keys)
+  if not keys:
+    return
+  copy_rows(db.session.connection(), Show.__table__, [
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+    for venue_id, artist_id, start_time in keys])
+  now = datetime.now()
+  for index, (model, key_column, show_column) in enumerate(SHOW_SUMMARIES):
+    refresh_show_summary(model, key_column, show_column, sorted({key[index] for key in keys}), now)
+  db.session.info.setdefault('changed_tables', set()).add(Show.__tablename__)
+
+#----------------------------------------------------------------------------#
+# Show archive.
+#----------------------------------------------------------------------------#
+
+SHOW_COLUMNS = ('venue_id', 'artist_id', 'start_time')
+
+def month_start(value, months=0):
+  month = value.year * 12 + value.month - 1 + months
+  return datetime(month // 12, month % 12 + 1, 1)
+
+def show_partitions(connection):
+  # {name: first day of its month} for the monthly partitions of `show`
+  partitions = {}
+  for name, in connection.execute(db.text(
+      "SELECT child.relname FROM pg_inherits"
+      " JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"
+      " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+      " WHERE parent.relname = 'show'")):
+    if name != 'show_default':
+      partitions[name] = datetime.strptime(name, 'show_y%Ym%m')
+  return partitions
+
+def create_show_partitions(months_ahead=None, now=None):
+  # creates the monthly partitions of `show` from the current month to
+  # `months_ahead` months out; shows already sitting in the default
+  # partition for a new month are moved into it. PostgreSQL only.
+  connection = db.session.connection()
+  if connection.dialect.name != 'postgresql':
+    return []
+  months_ahead = app.config['SHOW_PARTITION_MONTHS_AHEAD'] if months_ahead is None else months_ahead
+  existing = show_partitions(connection)
+  first = month_start(now or datetime.now())
+  created = []
+  for months in range(months_ahead + 1):
+    start, end = month_start(first, months), month_start(first, months + 1)
+    name = start.strftime('show_y%Ym%m')
+    if name in existing:
+      continue
+    bounds = {'start': start, 'end': end}
+    connection.execute(db.text('CREATE TABLE {} (LIKE show INCLUDING DEFAULTS)'.format(name)))
+    connection.execute(db.text(
+      'WITH moved AS (DELETE FROM show_default WHERE start_time >= :start AND start_time < :end RETURNING *)'
+      ' INSERT INTO {} SELECT * FROM moved'.format(name)), bounds)
+    connection.execute(db.text(
+      'ALTER TABLE show ATTACH PARTITION {} FOR VALUES FROM (:start) TO (:end)'.format(name)), bounds)
+    created.append(name)
+  db.session.commit()
+  return created
+
+def archive_shows(days=None, now=None):
+  # moves shows that started more than `days` ago into show_archive. On
+  # PostgreSQL whole monthly partitions past the horizon are copied and
+  # dropped; the rest moves with DELETE ... RETURNING. Summaries count both
+  # tables, so they are left as they are.
+  days = app.config['SHOW_ARCHIVE_AFTER_DAYS'] if days is None else days
+  cutoff = (now or datetime.now()) - timedelta(days=days)
+  connection = db.session.connection()
+  archive = ShowArchive.__table__
+  columns = ', '.join(SHOW_COLUMNS)
+  moved = 0
+
+  if connection.dialect.name == 'postgresql':
+    for name, start in sorted(show_partitions(connection).items(), key=lambda item: item[1]):
+      if month_start(start, 1) <= cutoff:
+        moved += connection.execute(db.text('INSERT INTO {0} ({1}) SELECT {1} FROM {2}'.format(
+          archive.name, columns, name))).rowcount
+        connection.execute(db.text('DROP TABLE {}'.format(name)))
+    moved += connection.execute(db.text(
+      'WITH moved AS (DELETE FROM show WHERE start_time < :cutoff RETURNING {1})'
+      ' INSERT INTO {0} ({1}) SELECT {1} FROM moved'.format(archive.name, columns)),
+      {'cutoff': cutoff}).rowcount
+  else:
+    old_shows = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).filter(Show.start_time < cutoff)
+    moved = connection.execute(archive.insert().from_select(list(SHOW_COLUMNS), old_shows.statement)).rowcount
+    Show.query.filter(Show.start_time < cutoff).delete(synchronize_session=False)
+
+  db.session.info.setdefault('changed_tables', set()).add(Show.__tablename__)
+  db.session.commit()
+  return moved
+
+#----------------------------------------------------------------------------#
+# Booking.
+#----------------------------------------------------------------------------#
+
+def booking_conflicts(bookings):
+  # a show holds its venue and artist for BOOKING_SLOT_MINUTES; two shows
+  # conflict when their start times are closer than that. Existing shows
+  # are checked in one query of range scans on the (venue_id, start_time)
+  # and (artist_id, start_time) indexes.
+  slot = timedelta(minutes=app.config['BOOKING_SLOT_MINUTES'])
+  conflicts = []
+
+  for index, side in ((0, 'venue'), (1, 'artist')):
+    ordered = sorted(bookings, key=lambda booking: (booking[index], booking[2]))
+    for previous, booking in zip(ordered, ordered[1:]):
+      if previous[index] == booking[index] and booking[2] - previous[2] < slot:
+        conflicts.append({"booking": booking, "conflicts_with": previous, "reason": side})
+
+  conditions = []
+  for venue_id, artist_id, start_time in bookings:
+    window = (Show.start_time > start_time - slot, Show.start_time < start_time + slot)
+    conditions.append(db.and_(Show.venue_id == venue_id, *window))
+    conditions.append(db.and_(Show.artist_id == artist_id, *window))
+  existing = db.session.query(Show.venue_id, Show.artist_id, Show.start_time
+    ).filter(db.or_(*conditions)).all() if conditions else []
+  for booking in bookings:
+    for show in existing:
+      if abs(show.start_time - booking[2]) < slot:
+        for index, side in ((0, 'venue'), (1, 'artist')):
+          if show[index] == booking[index]:
+            conflicts.append({"booking": booking, "conflicts_with": tuple(show), "reason": side})
+  return conflicts
+
+def book_shows(bookings):
+  # books (venue_id, artist_id, start_time) tuples in one transaction, or
+  # none of them; returns the list of conflicts, empty on success.
+  # the venue and artist rows are locked FOR UPDATE, in id order so that
+  # overlapping bookings cannot deadlock, until the transaction ends, so a
+  # concurrent booking of the same venue or artist waits for this one's
+  # check and insert (SQLite ignores FOR UPDATE, but allows one writer)
+  bookings = [tuple(booking) for booking in bookings]
+  venue_ids = {booking[0] for booking in bookings}
+  artist_ids = {booking[1] for booking in bookings}
+  known_venues = {key for key, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)
+    ).order_by(Venue.id).with_for_update()}
+  known_artists = {key for key, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids)
+    ).order_by(Artist.id).with_for_update()}
+  conflicts = [
+    {"booking": booking, "conflicts_with": None, "reason": "unknown venue" if booking[0] not in known_venues else "unknown artist"}
+    for booking in bookings if booking[0] not in known_venues or booking[1] not in known_artists]
+  conflicts += booking_conflicts(bookings)
+  if not conflicts:
+    insert_shows(bookings)
+  return conflicts
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+def validate_import_row(form_class, row):
+  # runs a file row through the same form the web views use
+  formdata = MultiDict()
+  for field, value in row.items():
+    if value is None or field.startswith('_'):
+      continue
+    if field == 'genres' and isinstance(value, str):
+      value = [genre.strip() for genre in value.split(',')]
+    for item in (value if isinstance(value, list) else [value]):
+      formdata.add(field, str(item))
+  # a missing column and an empty CSV cell both mean not seeking
+  for field in ('seeking_talent', 'seeking_venue'):
+    if hasattr(form_class, field) and not formdata.get(field):
+      formdata[field] = 'False'
+  form = form_class(formdata=formdata, meta={'csrf': False})
+  return form, (None if form.validate() else form.errors)
+
+def genre_ids(names):
+  ids = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+  missing = [name for name in names if name not in ids]
+  if missing:
+    db.session.execute(Genre.__table__.insert(), [{'name': name} for name in missing])
+    ids.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(missing)))
+  return ids
+
+def import_entities(model, form_class, link_table, batch, rejects):
+  columns = [column.name for column in model.__table__.columns
+             if column.name != 'id' and hasattr(form_class, column.name)]
+  valid = []
+  for line_number, row in batch:
+    form, errors = validate_import_row(form_class, row)
+    if errors:
+      rejects.write(line_number, row, errors)
+    else:
+      valid.append(form)
+  connection = db.session.connection()
+  ids = allocate_ids(connection, model.__table__, len(valid))
+  copy_rows(connection, model.__table__, [
+    dict({column: form[column].data for column in columns}, id=key) for key, form in zip(ids, valid)])
+  genres = genre_ids(sorted({genre for form in valid for genre in form.genres.data}))
+  link_key = model.__tablename__ + '_id'
+  copy_rows(connection, link_table, [
+    {link_key: key, 'genre_id': genres[genre]}
+    for key, form in zip(ids, valid) for genre in dict.fromkeys(form.genres.data)])
+  # the bulk copy skips the flush tracking, so the tables are marked here;
+  # the page cache and, through it, the in-memory indexes follow on commit
+  db.session.info.setdefault('changed_tables', set()).update((model.__tablename__, link_table.name))
+  return len(valid)
+
+def resolve_import_keys(model, rows, field):
+  # maps each row to an entity id given either <field>_id or <field>_name,
+  # with one query per batch for each form of reference
+  ids = {row[field + '_id'] for row in rows if row.get(field + '_id')}
+  names = {row[field + '_name'] for row in rows if not row.get(field + '_id') and row.get(field + '_name')}
+  known = {str(key) for key, in db.session.query(model.id).filter(model.id.in_(ids))} if ids else set()
+  by_name = {}
+  if names:
+    for name, key in db.session.query(model.name, model.id).filter(model.name.in_(names)):
+      by_name[name] = None if name in by_name else key
+  resolved = []
+  for row in rows:
+    if row.get(field + '_id'):
+      resolved.append(int(row[field + '_id']) if str(row[field + '_id']) in known else None)
+    else:
+      resolved.append(by_name.get(row.get(field + '_name')))
+  return resolved
+
+def import_shows(batch, rejects):
+  checked = []
+  for line_number, row in batch:
+    form, errors = validate_import_row(ShowForm, row)
+    if not row.get('start_time'):
+      errors = {'start_time': ['This field is required.']}
+    if errors:
+      rejects.write(line_number, row, errors)
+    else:
+      checked.append((line_number, row, form.start_time.data))
+  rows = [row for _, row, _ in checked]
+  venue_ids = resolve_import_keys(Venue, rows, 'venue')
+  artist_ids = resolve_import_keys(Artist, rows, 'artist')
+
+  keys = {}
+  for (line_number, row, start_time), venue_id, artist_id in zip(checked, venue_ids, artist_ids):
+    key = (venue_id, artist_id, start_time)
+    if venue_id is None or artist_id is None:
+      rejects.write(line_number, row, {'show': ['Unknown or ambiguous venue/artist.']})
+    elif key in keys:
+      rejects.write(line_number, row, {'show': ['Duplicate show in file.']})
+    else:
+      keys[key] = (line_number, row)
+  if keys:
+    existing = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).filter(
+      db.tuple_(Show.venue_id, Show.artist_id, Show.start_time).in_(list(keys)))
+    for key in existing:
+      rejects.write(*keys.pop(tuple(key)), {'show': ['Show already exists.']})
+
+  insert_shows(keys)
+  return len(keys)
+
+IMPORTERS = {
+  'venues': lambda batch, rejects: import_entities(Venue, VenueForm, venue_genre, batch, rejects),
+  'artists': lambda batch, rejects: import_entities(Artist, ArtistForm, artist_genre, batch, rejects),
+  'shows': import_shows,
+}
+
+def import_file(kind, path, rejects_path=None, batch_size=1000, progress=None):
+  # streams `path` in batches of `batch_size`, one transaction per batch
+  rejects = RejectWriter(rejects_path or path + '.rejects.jsonl')
+  stats = ImportStats()
+  try:
+    for batch in batches(read_rows(path), batch_size):
+      stats.read += len(batch)
+      try:
+        stats.imported += IMPORTERS[kind](batch, rejects)
+        db.session.commit()
+      except Exception as error:
+        db.session.rollback()
+        for line_number, row in batch:
+          rejects.write(line_number, row, {'batch': [str(error).splitlines()[0]]})
+      if progress:
+        progress(stats, rejects)
+  finally:
+    rejects.close()
+  return stats, rejects
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+EXPORT_COLUMNS = ['start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name']
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def export_shows(format='ndjson', chunk_rows=1000):
+  # yields the show export in text chunks of `chunk_rows` rows; one joined
+  # column query over the show and show_archive tables, read through a
+  # server-side cursor, so memory stays flat
+  def shows(model):
+    return db.session.query(
+        model.start_time, model.venue_id, Venue.name.label('venue_name'),
+        model.artist_id, Artist.name.label('artist_name')
+      ).join(Venue, Venue.id == model.venue_id).join(Artist, Artist.id == model.artist_id)
+
+  results = shows(Show).union_all(shows(ShowArchive)
+    ).order_by(Show.start_time, Show.venue_id, Show.artist_id
+    ).yield_per(chunk_rows)
+
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  if format == 'csv':
+    writer.writerow(EXPORT_COLUMNS)
+  for count, row in enumerate(results, 1):
+    if format == 'csv':
+      writer.writerow(row)
+    else:
+      buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat) + '\n')
+    if count % chunk_rows == 0:
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+  yield buffer.getvalue()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+app.cli.add_command(fyyur_cli)
+
+@fyyur_cli.command('rollover')
+def rollover_command():
+  """Move shows that have started from upcoming to past. Run periodically."""
+  click.echo('Refreshed {} show summaries.'.format(rollover_show_summary()))
+
+@fyyur_cli.command('rebuild-summary')
+def rebuild_summary_command():
+  """Recompute every show summary from the show and show_archive tables."""
+  rebuild_show_summary()
+  click.echo('Show summaries rebuilt.')
+
+@fyyur_cli.command('archive')
+@click.option('--days', type=int, default=None, help='Archive shows older than this (default SHOW_ARCHIVE_AFTER_DAYS).')
+def archive_command(days):
+  """Move past shows into the show_archive table."""
+  click.echo('Archived {} shows.'.format(archive_shows(days)))
+
+@fyyur_cli.command('partitions')
+@click.option('--months', type=int, default=None, help='Months ahead to create (default SHOW_PARTITION_MONTHS_AHEAD).')
+def partitions_command(months):
+  """Create the upcoming monthly partitions of the show table (PostgreSQL)."""
+  created = create_show_partitions(months)
+  click.echo('Created {} partitions{}'.format(len(created), ': ' + ', '.join(created) if created else '.'))
+
+@fyyur_cli.command('assets')
+def assets_command():
+  """Fingerprint and precompress the static files into ASSETS_FOLDER."""
+  manifest = assets.build(app.static_folder)
+  click.echo('Built {} assets into {}.'.format(len(manifest), assets.folder))
+
+@fyyur_cli.command('warm')
+def warm_command():
+  """Compile every template into the bytecode cache and report startup times."""
+  names = startup.time('templates', compile_templates)
+  click.echo('Compiled {} templates.'.format(len(names)))
+  click.echo(startup.report())
+
+@fyyur_cli.command('clear-cache')
+def clear_cache_command():
+  """Empty the page cache (shared with PAGE_CACHE_PATH), e.g. after a deploy."""
+  page_cache.clear()
+  click.echo('Page cache cleared.')
+
+@fyyur_cli.command('export')
+@click.option('--format', 'format', type=click.Choice(sorted(EXPORT_MIMETYPES)), default='ndjson', show_default=True)
+@click.option('--output', type=click.File('w'), default='-', help='File to write (default: stdout).')
+def export_command(format, output):
+  """Export every show with its venue and artist names."""
+  for chunk in export_shows(format):
+    output.write(chunk)
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False),
+              help='Where to write rejected rows (default: PATH.rejects.jsonl).')
+@click.option('--batch-size', default=1000, show_default=True)
+def import_command(kind, path, rejects_path, batch_size):
+  """Stream venues, artists or shows from a .csv or .jsonl file."""
+  def progress(stats, rejects):
+    click.echo('{}: {} read, {} imported, {} rejected, {:.0f} rows/s'.format(
+      kind, stats.read, stats.imported, rejects.count, stats.rate()), err=True)
+  stats, rejects = import_file(kind, path, rejects_path, batch_size, progress)
+  click.echo('Imported {} of {} {} ({:.0f} rows/s).'.format(stats.imported, stats.read, kind, stats.rate()))
+  if rejects.count:
+    click.echo('{} rejected rows written to {}.'.format(rejects.count, rejects.path))
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# rendered title/content blocks of the read pages; the layout around them
+# is rendered per request so flashes and CSRF tokens stay per-session;
+# with PAGE_CACHE_PATH set, every worker on the host shares one cache
+if app.config.get('PAGE_CACHE_PATH'):
+  page_cache = SQLiteCache(app.config['PAGE_CACHE_PATH'], app.config['PAGE_CACHE_MAX_ENTRIES'],
+    app.config['PAGE_CACHE_MAX_BYTES'], ttl=app.config.get('PAGE_CACHE_TTL'))
+else:
+  page_cache = LRUCache(app.config['PAGE_CACHE_MAX_ENTRIES'], app.config['PAGE_CACHE_MAX_BYTES'])
+
+# a page refilled from a replica that has not replayed a write yet would
+# stay stale in the cache, so misses on tables written recently (by any
+# process sharing the cache, which records when it dropped their pages)
+# read from the primary
+def read_primary_if_written(tables):
+  if len(db.replicas) and time.time() - page_cache.last_invalidated(*tables) < db.read_your_writes:
+    g.read_primary = True
+
+def cached_page(*tables):
+  # caches the page per route and arguments, tagged with the tables it reads
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+      blocks = page_cache.get(key)
+      if blocks is None:
+        read_primary_if_written(tables)
+        g.page_cache_fill = (key, tables)
+        response = make_response(view(*args, **kwargs))
+        response.headers['X-Cache'] = 'MISS'
+        return response
+      if isinstance(blocks, bytes):
+        response = Response(blocks, mimetype='application/json')
+      else:
+        response = make_response(render_template('layouts/cached.html', cached_blocks=blocks))
+      response.headers['X-Cache'] = 'HIT'
+      return response
+    return wrapper
+  return decorator
+
+def render_page(template_name, **context):
+  # render_template for @cached_page views: renders the page's own blocks,
+  # stores them, and wraps them in the layout
+  fill = g.pop('page_cache_fill', None)
+  if fill is None:
+    return render_template(template_name, **context)
+  template = app.jinja_env.get_template(template_name)
+  app.update_template_context(context)
+  template_context = template.new_context(context)
+  blocks = {
+    name: Markup(''.join(template.blocks[name](template_context)))
+    for name in ('title', 'content')
+  }
+  key, tables = fill
+  page_cache.set(key, blocks, tables, size=sum(len(block) for block in blocks.values()))
+  return render_template('layouts/cached.html', cached_blocks=blocks)
+
+def stream_page(template_name, **context):
+  # render_page, streamed: the layout and the page's content block go out
+  # as they render, and the blocks are cached once the whole page has
+  template = app.jinja_env.get_template(template_name)
+  app.update_template_context(context)
+  template_context = template.new_context(context)
+  title = Markup(''.join(template.blocks['title'](template_context)))
+  fill = g.pop('page_cache_fill', None)
+
+  def content():
+    chunks = []
+    for chunk in template.blocks['content'](template_context):
+      chunks.append(chunk)
+      yield Markup(chunk)
+    if fill is not None:
+      key, tables = fill
+      blocks = {'title': title, 'content': Markup(''.join(chunks))}
+      page_cache.set(key, blocks, tables, size=sum(len(block) for block in blocks.values()))
+
+  # the session cookie is written before the body, so flashes are popped
+  # and the CSRF token created now rather than while streaming
+  get_flashed_messages()
+  if app.config.get('WTF_CSRF_ENABLED', True):
+    generate_csrf()
+  context['streamed_blocks'] = {'title': title, 'content': content()}
+  stream = app.jinja_env.get_template('layouts/streamed.html').stream(context)
+  stream.enable_buffering(app.config['STREAM_BUFFER_CHUNKS'])
+  return Response(stream_with_context(stream), mimetype='text/html')
+
+def render_json(data):
+  # jsonify for @cached_page views; the serialized body is cached as is
+  response = jsonify(data)
+  fill = g.pop('page_cache_fill', None)
+  if fill is not None:
+    key, tables = fill
+    page_cache.set(key, response.get_data(), tables)
+  return response
+
+# tables whose writes can change a venue or artist page
+VALIDATOR_TABLES = ('venue', 'artist', 'show', 'venue_show_summary', 'artist_show_summary')
+
+def entity_validators(model, summary_model, key):
+  # (version, updated_at, next_show_time) of one venue or artist, kept in
+  # the page cache until a write to the tables behind its page commits.
+  # Only a shared cache (PAGE_CACHE_PATH) sees the writes of every process,
+  # so with the per-process one each request reads the row instead; an
+  # entry missing another worker's bump would answer 304 for a new body
+  shared = bool(app.config.get('PAGE_CACHE_PATH'))
+  cache_key = ('validators', model.__tablename__, key)
+  validators = page_cache.get(cache_key) if shared else None
+  if validators is None:
+    summary_key = getattr(summary_model, model.__tablename__ + '_id')
+    validators = db.session.query(model.version, model.updated_at, summary_model.next_show_time
+      ).outerjoin(summary_model, summary_key == model.id
+      ).filter(model.id == key).first()
+    if validators is None:
+      abort(404)
+    validators = tuple(validators)
+    if shared:
+      page_cache.set(cache_key, validators, VALIDATOR_TABLES, size=64)
+  return validators
+
+def conditional_entity(model, summary_model):
+  # serves the view as JSON when the client prefers it (Accept:
+  # application/json), with a strong ETag and Last-Modified from the
+  # entity's version; a matching If-None-Match / If-Modified-Since gets a
+  # 304 before the view runs. HTML pages carry per-session CSRF tokens and
+  # flashes, so they are always rendered.
+  def decorator(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+      key = kwargs[model.__tablename__ + '_id']
+      # the ETag names a version, so the body must not come from a replica
+      # that is behind it
+      read_primary_if_written(VALIDATOR_TABLES)
+      version, updated_at, next_show_time = entity_validators(model, summary_model, key)
+      g.wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+      if not g.wants_json:
+        response = make_response(view(**kwargs))
+        response.vary.add('Accept')
+        return response
+
+      # shows that have started move from upcoming to past before the next
+      # rollover bumps the version, so until then the latest of them is part
+      # of the ETag and Last-Modified
+      etag = '{}-{}-{}'.format(model.__tablename__, key, version)
+      last_modified = updated_at
+      now = datetime.now()
+      if next_show_time is not None and next_show_time <= now:
+        show_column = getattr(Show, model.__tablename__ + '_id')
+        started = db.session.query(db.func.max(Show.start_time)).filter(
+          show_column == key, Show.start_time >= next_show_time, Show.start_time <= now).scalar() or next_show_time
+        etag += '-started-{:%Y%m%dT%H%M%S}'.format(started)
+        # start times are local, updated_at is UTC
+        started = started + (datetime.utcnow() - now)
+        last_modified = max(updated_at or started, started)
+      if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(view(**kwargs))
+      else:
+        response = Response(status=304)
+      response.set_etag(etag)
+      response.last_modified = last_modified
+      response.cache_control.no_cache = True
+      response.vary.add('Accept')
+      return response
+    return wrapper
+  return decorator
+
+def render_entity(template_name, **context):
+  # render_template for @conditional_entity views: the page's dict (the
+  # first keyword argument) as JSON when that is what the client asked for
+  if g.get('wants_json'):
+    data = next(iter(context.values()))
+    return Response(json.dumps(data, default=datetime.isoformat), mimetype='application/json')
+  return render_template(template_name, **context)
+
+@event.listens_for(Session, 'after_flush')
+def track_flushed_tables(session, flush_context):
+  tables = session.info.setdefault('changed_tables', set())
+  for instance in session.new | session.dirty | session.deleted:
+    tables.add(instance.__table__.name)
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def track_bulk_tables(context):
+  entity = context.query.column_descriptions[0]['entity']
+  context.session.info.setdefault('changed_tables', set()).add(entity.__table__.name)
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_pages(session):
+  tables = session.info.pop('changed_tables', None)
+  changes = session.info.pop('index_changes', ())
+  if tables:
+    invalidated_at, previous = page_cache.invalidate(*tables)
+    apply_index_changes(changes, invalidated_at, previous)
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_tables(session):
+  session.info.pop('changed_tables', None)
+  session.info.pop('index_changes', None)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
+@cached_page()
 def index():
-  return render_template('pages/home.html')
+  return render_page('pages/home.html')
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cached_page('venue', 'show')
 def venues():
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
  
-  datavenues=[]
-  results  = Venue.query.with_entities(Venue.city,Venue.state).distinct().all()
-  
-  for result in results:
-    venues=[]
-    venuelists = Venue.query.filter_by(city=result.city,state=result.state)
-    
-    for venuelist in venuelists:
-      venueresults = Show.query.filter_by(venue_id=venuelist.id).all()
-      num_upcoming_shows = len(venueresults)
-      
-      venues.append({"id":venuelist.id,"name":venuelist.name,"num_upcoming_shows":num_upcoming_shows})
+  results, page = keyset_page(db.session.query(
+      Venue.city, Venue.state, Venue.id, Venue.name,
+      db.func.coalesce(VenueShowSummary.upcoming_shows_count, 0).label('num_upcoming_shows')
+    ).outerjoin(VenueShowSummary, VenueShowSummary.venue_id == Venue.id
+    ), [Venue.city, Venue.state, Venue.id])
 
-    datavenues.append({"city":result.city,"state":result.state,"venues":venues})
- 
+  datavenues=[]
+  for (city, state), rows in groupby(results, key=lambda row: (row.city, row.state)):
+    venues=[{"id":row.id,"name":row.name,"num_upcoming_shows":row.num_upcoming_shows} for row in rows]
+    datavenues.append({"city":city,"state":state,"venues":venues})
 
- 
-  return render_template('pages/venues.html', areas=datavenues)
+  return render_page('pages/venues.html', areas=datavenues, page=page)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
@@ -139,56 +1404,43 @@ def search_venues():
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   searchname = request.form.get('search_term', '')
-  search = "%{}%".format(searchname)
-
 
   data=[]
-  results = Venue.query.filter(Venue.name.ilike(search)).all()
-  count = len(results)
-  
+  results = search_names(Venue, searchname)
   for result in results:
-    
     data.append({"id":result.id,"name":result.name})
 
-  response = {"count":count,"data":data}
-  
+  response = {"count":len(data),"data":data}
 
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
+@app.route('/api/venues/autocomplete')
+def autocomplete_venues():
+  # typeahead for venue pickers, e.g. /api/venues/autocomplete?q=mus
+  return autocomplete_response(Venue)
+
+@app.route('/venues/browse')
+def browse_venues():
+  # faceted browse, e.g. /venues/browse?genre=Rock n Roll&city=San Francisco&state=CA&seeking=1
+  facets = {
+    "genre": request.args.get('genre'),
+    "city": request.args.get('city'),
+    "state": request.args.get('state'),
+    "seeking": bool(request.args.get('seeking')),
+  }
+  results, genre_counts = browse(Venue, venue_genre, Venue.seeking_talent, **facets)
+  return render_template('pages/browse.html', kind='venues', results=results, genre_counts=genre_counts, facets=facets)
+
 @app.route('/venues/<int:venue_id>')
+@conditional_entity(Venue, VenueShowSummary)
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
   venue = Venue.query.get(venue_id)
-  genres=[]
-  for genresitem in venue.genres.split(","):
-     
-     genres.append(genresitem)
-  
-  past_shows=[]
-  results = Show.query.filter(Show.start_time < datetime.now()).all()
-  if len(results) > 0:
-    for result in results:
-      if result.venue_id == venue_id:
-        past_show={
-          "artist_id": result.artist.id,
-          "artist_name": result.artist.name,
-          "artist_image_link": result.artist.image_link,
-          "start_time": result.start_time
-        }
-        past_shows.append(past_show)
-  upcoming_shows=[]
-  results = Show.query.filter(Show.start_time > datetime.now()).all()
-  if len(results) > 0:
-    for result in results:
-      if result.venue_id == venue_id:
-        upcoming_show={
-          "artist_id": result.artist.id,
-          "artist_name": result.artist.name,
-          "artist_image_link": result.artist.image_link,
-          "start_time": result.start_time
-        }
-        upcoming_shows.append(upcoming_show)
+  genres = venue.genres
+
+  past_shows, upcoming_shows = venue_timeline(venue_id)
+  summary = VenueShowSummary.query.get(venue_id) or VenueShowSummary(upcoming_shows_count=0, past_shows_count=0)
   data={
     "id": venue.id,
     "name": venue.name,
@@ -204,12 +1456,15 @@ def show_venue(venue_id):
     "image_link": venue.image_link,
     "past_shows":past_shows,
     "upcoming_shows":upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
+    "past_shows_count": summary.past_shows_count,
+    "upcoming_shows_count": summary.upcoming_shows_count
   }
  
   # data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
-  return render_template('pages/show_venue.html', venue=data)
+  # suggestions change with other entities' edits, so they are left out
+  # of the versioned JSON
+  matches = [] if g.get('wants_json') else suggest_matches(Venue, venue)
+  return render_entity('pages/show_venue.html', venue=data, matches=matches)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -237,7 +1492,7 @@ def create_venue_submission():
       seeking_talent = form.seeking_talent.data
       seeking_description = form.seeking_description.data
       website = form.website.data
-      genres = ','.join(form.genres.data)
+      genres = form.genres.data
       facebook_link = form.facebook_link.data
 
       record = Venue(name=name, city=city, 
@@ -274,6 +1529,7 @@ def delete_venue(venue_id):
   # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
   # clicking that button delete it from the db then redirect the user to the homepage
   try:
+    forget_name(Venue, int(venue_id))
     Venue.query.filter_by(id=venue_id).delete()
     db.session.commit()
   except:
@@ -285,12 +1541,13 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@cached_page('artist')
 def artists():
   # TODO: replace with real data returned from querying the database
 
-  data = Artist.query.all()
- 
-  return render_template('pages/artists.html', artists=data)
+  data, page = keyset_page(db.session.query(Artist.id, Artist.name), [Artist.name, Artist.id])
+
+  return render_page('pages/artists.html', artists=data, page=page)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -298,51 +1555,37 @@ def search_artists():
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
   searchname = request.form.get('search_term', '')
-  search = "%{}%".format(searchname)
 
-  data = Artist.query.filter(Artist.name.ilike(search)).all()
-  count = len(data)
-  
-  response = {"count":count,"data":data}
+  data = search_names(Artist, searchname)
+  response = {"count":len(data),"data":data}
 
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
+@app.route('/api/artists/autocomplete')
+def autocomplete_artists():
+  return autocomplete_response(Artist)
+
+@app.route('/artists/browse')
+def browse_artists():
+  facets = {
+    "genre": request.args.get('genre'),
+    "city": request.args.get('city'),
+    "state": request.args.get('state'),
+    "seeking": bool(request.args.get('seeking')),
+  }
+  results, genre_counts = browse(Artist, artist_genre, Artist.seeking_venue, **facets)
+  return render_template('pages/browse.html', kind='artists', results=results, genre_counts=genre_counts, facets=facets)
+
 @app.route('/artists/<int:artist_id>')
+@conditional_entity(Artist, ArtistShowSummary)
 def show_artist(artist_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
   artist = Artist.query.get(artist_id)
-  genres=[]
-  for genresitem in artist.genres.split(","):
-   
-     genres.append(genresitem)
-  
-  past_shows=[]
-  results = Show.query.filter(Show.start_time < datetime.now()).all()
-  if len(results) > 0:
-    for result in results:
-      if result.artist_id == artist_id:
-        past_show={
-          "venue_id": result.venue_id,
-          "venue_name": result.venue.name,
-          "venue_image_link": result.venue.image_link,
-          "start_time": result.start_time
-        }
-        past_shows.append(past_show)
-  upcoming_shows=[]
-
-  results = Show.query.filter(Show.start_time > datetime.now()).all()
-  if len(results) > 0:
-    for result in results:
-      if result.artist_id == artist_id:
-        upcoming_show={
-          "venue_id": result.venue_id,
-          "venue_name": result.venue.name,
-          "venue_image_link": result.venue.image_link,
-          "start_time": result.start_time
-        }
-        upcoming_shows.append(upcoming_show)
+  genres = artist.genres
 
+  past_shows, upcoming_shows = artist_timeline(artist_id)
+  summary = ArtistShowSummary.query.get(artist_id) or ArtistShowSummary(upcoming_shows_count=0, past_shows_count=0)
 
   data={
     "id": artist.id,
@@ -358,50 +1601,37 @@ def show_artist(artist_id):
     "image_link": artist.image_link,
     "past_shows":past_shows,
     "upcoming_shows":upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
+    "past_shows_count": summary.past_shows_count,
+    "upcoming_shows_count": summary.upcoming_shows_count
   }
   
   
   # data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
-  return render_template('pages/show_artist.html', artist=data)
+  # suggestions change with other entities' edits, so they are left out
+  # of the versioned JSON
+  matches = [] if g.get('wants_json') else suggest_matches(Artist, artist)
+  return render_entity('pages/show_artist.html', artist=data, matches=matches)
 
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   artist = Artist.query.get(artist_id)
-  genres=[]
-  for genresitem in artist.genres.split(","):
-     
-     genres.append(genresitem)
-  
-  artist.genres=genres
   form = ArtistForm(obj=artist)
   
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  # TODO: take values from the form submitted, and update existing
-  # artist record with ID <artist_id> using the new attributes
+  # writes only the changed fields, in an UPDATE that only matches the
+  # row_version the form was loaded with; a concurrent edit gets a 409
   artist = Artist.query.get(artist_id)
   form = ArtistForm(request.form)
   
   if form.validate():
     try:
-      artist.name = form.name.data
-      artist.city = form.city.data
-      artist.state = form.state.data
-      artist.phone = form.phone.data
-      artist.image_link = form.image_link.data
-      artist.genres = ",".join(form.genres.data) 
-      artist.seeking_venue = form.seeking_venue.data
-      artist.seeking_description = form.seeking_description.data
-      artist.website = form.website.data
-      artist.facebook_link = form.facebook_link.data
-
-      db.session.commit()
+      if not save_edit(artist, form):
+        return edit_conflict('forms/edit_artist.html', form, artist=Artist.query.get(artist_id))
       
     except:
       db.session.rollback()
@@ -409,7 +1639,7 @@ def edit_artist_submission(artist_id):
     finally:
       db.session.close()
   else:
-    return render_template('forms/edit_venue.html', form=form,artist=artist)
+    return render_template('forms/edit_artist.html', form=form,artist=artist)
     
   return redirect(url_for('show_artist', artist_id=artist_id))
 
@@ -417,6 +1647,7 @@ def edit_artist_submission(artist_id):
 def delete_artist(artist_id):
 
   try:
+    forget_name(Artist, int(artist_id))
     Artist.query.filter_by(id=artist_id).delete()
     db.session.commit()
   except:
@@ -430,39 +1661,21 @@ def delete_artist(artist_id):
 def edit_venue(venue_id):
   
   venue = Venue.query.get(venue_id)
-  genres=[]
-  for genresitem in venue.genres.split(","):
-     
-     genres.append(genresitem)
-  
-  venue.genres=genres
   form = VenueForm(obj=venue)
  
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  # TODO: take values from the form submitted, and update existing
-  # venue record with ID <venue_id> using the new attributes
+  # writes only the changed fields, in an UPDATE that only matches the
+  # row_version the form was loaded with; a concurrent edit gets a 409
   venue = Venue.query.get(venue_id)
   form = VenueForm(request.form)
   
   if form.validate():
     try:
-      venue.name = form.name.data
-      venue.city = form.city.data
-      venue.state = form.state.data
-      venue.address = form.address.data
-      venue.phone = form.phone.data
-      venue.image_link = form.image_link.data
-      venue.genres = ",".join(form.genres.data)
-      
-      venue.seeking_talent = form.seeking_talent.data
-      venue.seeking_description = form.seeking_description.data
-      venue.website = form.website.data
-      venue.facebook_link = form.facebook_link.data
-
-      db.session.commit()
+      if not save_edit(venue, form):
+        return edit_conflict('forms/edit_venue.html', form, venue=Venue.query.get(venue_id))
       
     except:
       db.session.rollback()
@@ -495,7 +1708,7 @@ def create_artist_submission():
       seeking_venue = form.seeking_venue.data
       seeking_description = form.seeking_description.data
       website = form.website.data
-      genres = ','.join(form.genres.data)
+      genres = form.genres.data
       facebook_link = form.facebook_link.data
 
       record = Artist(name=name, city=city, 
@@ -526,33 +1739,59 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@cached_page('show', 'venue', 'artist')
 def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  showdata = Show.query.all()
-  data = []
-
-  for dataitem in showdata:
-
-  # genres=[]
-  # for genresitem in artist.genres.split(","):
-   
-  #    genres.append(genresitem)
-  
-    
-    subdata={
-      "venue_id": dataitem.venue_id,
-      "venue_name": dataitem.venue.name,
-      "artist_id": dataitem.artist_id,
-      "artist_name": dataitem.artist.name,
-      "artist_image_link": dataitem.artist.image_link,
-      "start_time": dataitem.start_time
-    }
-    data.append(subdata)
-    
-  
-  return render_template('pages/shows.html', shows=data)
+  # displays list of shows at /shows, one joined column query per page
+  rows, page = keyset_page(show_listing(), [Show.start_time, Show.venue_id, Show.artist_id])
+  return stream_page('pages/shows.html', shows=rows, page=page)
+
+@app.route('/api/calendar')
+@cached_page('show', 'venue', 'artist', 'genre')
+def calendar():
+  # shows between two dates (inclusive), bucketed by day:
+  # /api/calendar?start=2027-05-21&end=2027-05-23&state=CA&genre=Jazz
+  # end defaults to a week from start; pages through ?after= / ?before=
+  try:
+    start = date.fromisoformat(request.args['start'])
+    end = date.fromisoformat(request.args['end']) if request.args.get('end') else start + timedelta(days=6)
+  except (KeyError, ValueError):
+    return jsonify({"error": "start and end must be YYYY-MM-DD dates."}), 400
+  if not start <= end < start + timedelta(days=app.config['CALENDAR_MAX_DAYS']):
+    return jsonify({"error": "The range must cover 1 to {} days.".format(app.config['CALENDAR_MAX_DAYS'])}), 400
+
+  results, page = keyset_page(calendar_query(
+      start, end + timedelta(days=1),
+      city=request.args.get('city'),
+      state=request.args.get('state'),
+      genre=request.args.get('genre'),
+      venue_id=request.args.get('venue_id', type=int),
+      artist_id=request.args.get('artist_id', type=int),
+    ), [Show.start_time, Show.venue_id, Show.artist_id])
+
+  days = []
+  for day, rows in groupby(results, key=lambda row: row.start_time.date()):
+    shows = [{
+      "venue_id": row.venue_id,
+      "venue_name": row.venue_name,
+      "city": row.city,
+      "state": row.state,
+      "artist_id": row.artist_id,
+      "artist_name": row.artist_name,
+      "artist_image_link": row.artist_image_link,
+      "start_time": row.start_time.isoformat()
+    } for row in rows]
+    days.append({"date": day.isoformat(), "shows": shows})
+  return render_json({"start": start.isoformat(), "end": end.isoformat(), "days": days, "page": page})
+
+@app.route('/shows/export')
+def export_shows_view():
+  # streams all shows as NDJSON (default) or CSV: /shows/export?format=csv
+  format = request.args.get('format', 'ndjson')
+  if format not in EXPORT_MIMETYPES:
+    abort(400)
+  response = Response(stream_with_context(export_shows(format)), mimetype=EXPORT_MIMETYPES[format])
+  response.headers['Content-Disposition'] = 'attachment; filename=shows.{}'.format(format)
+  return response
 
 @app.route('/shows/create')
 def create_shows():
@@ -570,19 +1809,12 @@ def create_show_submission():
   
   if form.validate():
     try:
-      artist_id = form.artist_id.data
-      venue_id = form.venue_id.data
-      start_time = form.start_time.data
-
-      v = Venue.query.get(venue_id)
-      a = Artist.query.get(artist_id)
-      s = Show(venue_id=1, artist_id=1, start_time=start_time)
-      
-      v.show_venue.append(s)
-      a.show_artist.append(s)
-      
-      
-      db.session.add_all([v,a])
+      booking = (int(form.venue_id.data), int(form.artist_id.data), form.start_time.data)
+      conflicts = book_shows([booking])
+      if conflicts:
+        db.session.rollback()
+        form.start_time.errors.append(describe_conflict(conflicts[0]))
+        return render_template('forms/new_show.html', form=form), 409
       db.session.commit()
 
       flash('Show was successfully listed!')
@@ -593,10 +1825,50 @@ def create_show_submission():
     finally:
       db.session.close()
   else:
-    return render_template('forms/new_artist.html', form=form)
+    return render_template('forms/new_show.html', form=form)
   
   return render_template('pages/home.html')
 
+def describe_conflict(conflict):
+  if conflict["conflicts_with"] is None:
+    return 'The {} does not exist.'.format(conflict["reason"].split()[-1])
+  return 'The {} is already booked at {}.'.format(conflict["reason"], format_datetime(conflict["conflicts_with"][2], 'full'))
+
+@app.route('/api/shows', methods=['POST'])
+@csrf.exempt
+def book_shows_api():
+  # books one show or a whole tour in one transaction:
+  # {"artist_id": 1, "shows": [{"venue_id": 2, "start_time": "2027-05-21T21:30:00"}, ...]}
+  # or a single {"artist_id": 1, "venue_id": 2, "start_time": "..."}
+  body = request.get_json(silent=True)
+  if not isinstance(body, dict):
+    return jsonify({"error": "Expected a JSON object."}), 400
+  try:
+    shows = body.get('shows') or [body]
+    bookings = [(int(show['venue_id']), int(show.get('artist_id', body.get('artist_id'))),
+                 dateutil.parser.parse(show['start_time'])) for show in shows]
+  except (KeyError, TypeError, ValueError, OverflowError, AttributeError):
+    return jsonify({"error": "Each show needs venue_id, artist_id and start_time."}), 400
+  # start times are stored as the venue's local time, without an offset
+  if any(start_time.tzinfo is not None for venue_id, artist_id, start_time in bookings):
+    return jsonify({"error": "start_time must be a local time without a UTC offset."}), 400
+
+  conflicts = book_shows(bookings)
+  if conflicts:
+    db.session.rollback()
+    return jsonify({"error": "conflict", "conflicts": [
+      {"booking": show_key_json(conflict["booking"]),
+       "conflicts_with": show_key_json(conflict["conflicts_with"]),
+       "reason": conflict["reason"]} for conflict in conflicts]}), 409
+  db.session.commit()
+  return jsonify({"shows": [show_key_json(booking) for booking in bookings]}), 201
+
+def show_key_json(key):
+  if key is None:
+    return None
+  venue_id, artist_id, start_time = key
+  return {"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time.isoformat()}
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -606,8 +1878,10 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
+if not app.debug and app.config.get('LOG_ASYNC'):
+    init_logging(app)
+elif not app.debug:
+    file_handler = FileHandler(app.config.get('LOG_FILE', 'error.log'))
     file_handler.setFormatter(
         Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
     )
@@ -616,6 +1890,30 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Startup.
+#----------------------------------------------------------------------------#
+
+def compile_templates():
+  # loads every template into the environment's cache; with
+  # JINJA_BYTECODE_CACHE_DIR set their compiled code is also written there,
+  # so the next worker skips compiling them
+  names = app.jinja_env.list_templates(extensions=['html'])
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
+
+startup.mark('app')
+if app.config.get('PRECOMPILE_TEMPLATES'):
+  startup.time('templates', compile_templates)
+if app.config.get('PRELOAD_NAME_INDEXES'):
+  try:
+    startup.time('names', build_name_indexes)
+  except exc.SQLAlchemyError as error:
+    # e.g. before the first migration; the indexes are built on first use
+    app.logger.warning('Name indexes not preloaded: %s', str(error).splitlines()[0])
+app.logger.info('Startup times:\n%s', startup.report())
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
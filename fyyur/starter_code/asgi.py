@@ -0,0 +1,136 @@
+"""Optional ASGI entry point with an async database path for read views.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:application --workers 4
+
+Requests for READ_ENDPOINTS run the unchanged Flask views on the event
+loop, inside SQLAlchemy's greenlet bridge, with the session bound to an
+async engine (asyncpg on PostgreSQL, aiosqlite on SQLite). A view waiting
+on the database yields the loop to other requests instead of holding a
+thread. Every other request, including all writes, goes to the regular
+WSGI app in asgiref's thread pool on the sync engine.
+"""
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only, greenlet_spawn
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from app import app, db
+
+ASYNC_DRIVERS = {'postgres': 'postgresql+asyncpg', 'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+# views that only read, POST searches included
+READ_ENDPOINTS = {
+    'index', 'venues', 'show_venue', 'search_venues', 'browse_venues',
+    'artists', 'show_artist', 'search_artists', 'browse_artists',
+    'shows', 'calendar',
+}
+
+
+def async_database_uri(uri):
+    scheme, rest = uri.split('://', 1)
+    return '{}://{}'.format(ASYNC_DRIVERS[scheme.split('+')[0]], rest)
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin1')
+        environ[name] = environ[name] + ',' + value if name in environ else value
+    return environ
+
+
+class AsyncReadApplication(object):
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.engine = engine
+        self.wsgi = WsgiToAsgi(app)
+        app.before_request(self.bind_session)
+
+    def bind_session(self):
+        # the app's scoped session is removed at teardown as usual
+        if request.environ.get('fyyur.async'):
+            db.session.registry.set(Session(bind=self.engine.sync_engine))
+
+    def is_read(self, scope):
+        adapter = self.app.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, _ = adapter.match(scope['path'], scope['method'])
+        except (HTTPException, RequestRedirect):
+            return False
+        return endpoint in READ_ENDPOINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.is_read(scope):
+            return await self.wsgi(scope, receive, send)
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        environ = build_environ(scope, body)
+        environ['fyyur.async'] = True
+
+        await greenlet_spawn(self.call_wsgi, environ, send)
+
+    def call_wsgi(self, environ, send):
+        # runs in the greenlet, where await_only hands `send` to the event
+        # loop, so each chunk the app yields (e.g. a streamed page) goes out
+        # as it is produced instead of after the whole body is built
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+        def send_start():
+            if not started.get('sent'):
+                await_only(send({'type': 'http.response.start', 'status': started['status'],
+                                 'headers': started['headers']}))
+                started['sent'] = True
+
+        result = self.app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    send_start()
+                    await_only(send({'type': 'http.response.body', 'body': chunk, 'more_body': True}))
+            send_start()
+            await_only(send({'type': 'http.response.body', 'body': b''}))
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+engine = create_async_engine(
+    app.config.get('ASYNC_DATABASE_URI') or async_database_uri(app.config['SQLALCHEMY_DATABASE_URI']))
+application = AsyncReadApplication(app, engine)
@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# text formats worth compressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.ttf', '.eot', '.otf', '.json', '.txt', '.html'}
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MANIFEST = 'manifest.json'
+
+
+def fingerprint(path, content):
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def rewrite_css_urls(path, content, manifest):
+    # points url(...) references at the fingerprinted copies, keeping any
+    # ?query or #fragment
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        target = re.split(r'[?#]', url, 1)[0]
+        suffix = url[len(target):]
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if '://' in url or url.startswith(('data:', '/')) or resolved not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[resolved], directory)
+        return 'url({0}{1}{2}{0})'.format(quote, relative, suffix)
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def compressed_variants(content):
+    variants = {'.gz': gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+def build_assets(static_folder, output_folder):
+    """Write content-hashed copies of every static file to `output_folder`.
+
+    Stylesheets are written last, with their url() references rewritten to
+    the hashed names. Text files also get .gz (and .br when the brotli
+    package is installed) variants, kept only when smaller. Returns the
+    manifest mapping each original path to its hashed one, which is also
+    written to `output_folder`/manifest.json.
+    """
+    static_folder, output_folder = os.path.abspath(static_folder), os.path.abspath(output_folder)
+    sources = []
+    for directory, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = sorted(name for name in dirnames
+                             if not name.startswith('.') and os.path.join(directory, name) != output_folder)
+        for filename in sorted(filenames):
+            if not filename.startswith('.'):
+                full_path = os.path.join(directory, filename)
+                sources.append(os.path.relpath(full_path, static_folder).replace(os.sep, '/'))
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), 'rb') as source:
+            content = source.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content, manifest)
+        manifest[path] = fingerprint(path, content)
+
+        target = os.path.join(output_folder, manifest[path])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as output:
+            output.write(content)
+        if posixpath.splitext(path)[1].lower() in COMPRESSIBLE:
+            for suffix, compressed in compressed_variants(content).items():
+                if len(compressed) < len(content):
+                    with open(target + suffix, 'wb') as output:
+                        output.write(compressed)
+
+    with open(os.path.join(output_folder, MANIFEST), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets(object):
+    """Serves the output of build_assets under /assets.
+
+    `static_url(path)` (also a template global) returns the fingerprinted
+    URL of a static file, or its plain /static URL when there is no build
+    or the file is not in it. Fingerprinted files are served with a
+    far-future immutable Cache-Control, as brotli or gzip when the client
+    accepts it.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.config.get('ASSETS_FOLDER') or os.path.join(app.static_folder, 'dist')
+        self.load()
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.send)
+        app.add_template_global(self.static_url)
+
+    def load(self):
+        try:
+            with open(os.path.join(self.folder, MANIFEST)) as source:
+                self.manifest = json.load(source)
+        except FileNotFoundError:
+            self.manifest = {}
+
+    def build(self, static_folder):
+        self.manifest = build_assets(static_folder, self.folder)
+        return self.manifest
+
+    def static_url(self, path):
+        if path in self.manifest:
+            return url_for('assets', filename=self.manifest[path])
+        return url_for('static', filename=path)
+
+    def send(self, filename):
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        variant, encoding = filename, None
+        for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+            if request.accept_encodings.quality(name) and os.path.isfile(os.path.join(self.folder, filename + suffix)):
+                variant, encoding = filename + suffix, name
+                break
+        response = send_from_directory(self.folder, variant, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.vary.add('Accept-Encoding')
+        return response
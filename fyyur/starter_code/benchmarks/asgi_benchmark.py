@@ -0,0 +1,84 @@
+"""Concurrent read throughput: sync WSGI workers vs the async read path.
+
+Sends the same GET requests to the app in-process, once through a pool of
+`concurrency` threads calling the WSGI app (a threaded WSGI server) and once
+as `concurrency` concurrent tasks on the ASGI application in asgi.py. Reads
+the configured database, so point SQLALCHEMY_DATABASE_URI at a populated
+PostgreSQL for numbers that reflect production.
+
+    python -m benchmarks.asgi_benchmark [requests] [concurrency] [path ...]
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder
+
+from asgi import application
+from app import app
+
+PATHS = ['/venues/1', '/artists/1', '/venues/browse?state=CA', '/artists/browse?seeking=1']
+
+
+def call_wsgi(path):
+    environ = EnvironBuilder(path=path, headers={'Accept': 'text/html'}).get_environ()
+    status = []
+    body = b''.join(app(environ, lambda code, headers, exc_info=None: status.append(code)))
+    return int(status[0].split()[0]), len(body)
+
+
+async def call_asgi(path):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+        'headers': [(b'host', b'localhost'), (b'accept', b'text/html')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status'], sum(len(message.get('body', b'')) for message in messages[1:])
+
+
+def run_wsgi(paths, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(call_wsgi, paths))
+
+
+async def run_asgi(paths, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def limited(path):
+        async with slots:
+            return await call_asgi(path)
+
+    return await asyncio.gather(*[limited(path) for path in paths])
+
+
+def main(requests=2000, concurrency=50, *paths):
+    paths = list(paths) or PATHS
+    batch = [paths[i % len(paths)] for i in range(requests)]
+    print('database={} requests={} concurrency={}'.format(
+        app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0], requests, concurrency))
+
+    for label, run in (
+            ('wsgi threads', lambda: run_wsgi(batch, concurrency)),
+            ('asgi async', lambda: asyncio.run(run_asgi(batch, concurrency)))):
+        run_wsgi(paths, 1)
+        start = time.perf_counter()
+        results = run()
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for status, _ in results if status >= 500)
+        print('{:>12} {:8.0f} req/s  errors={}'.format(label, requests / elapsed, errors))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]], *sys.argv[3:])
@@ -0,0 +1,38 @@
+"""Typeahead lookups over a synthetic venue/artist catalog.
+
+Times PrefixIndex.complete for prefixes of growing length, as a user typing
+into the show form's pickers would send them, plus single-name updates.
+
+    python -m benchmarks.autocomplete_benchmark [rows]
+"""
+import sys
+import time
+
+from benchmarks.search_benchmark import catalog, timed
+from search import PrefixIndex
+
+PREFIXES = ['t', 'th', 'the', 'the m', 'the musical', 'sa', 'sax b', 'torv', 'zzz']
+
+
+def main(rows=1000000, limit=10):
+    names = list(catalog(rows))
+
+    start = time.perf_counter()
+    index = PrefixIndex()
+    index.add_all(names)
+    print('rows={} build={:.1f}s entries={}'.format(
+        rows, time.perf_counter() - start, len(index.starts) + len(index.words)))
+
+    for prefix in PREFIXES:
+        elapsed, found = timed(lambda: index.complete(prefix, limit), 1000)
+        print('{:>15} {:8.3f}ms results={}'.format(repr(prefix), elapsed, len(found)))
+
+    renamed = [(key, name + ' Live') for key, name in names[:1000]]
+    start = time.perf_counter()
+    for key, name in renamed:
+        index.add(key, name)
+    print('{:>15} {:8.3f}ms'.format('rename', (time.perf_counter() - start) / len(renamed) * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
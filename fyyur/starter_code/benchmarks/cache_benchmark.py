@@ -0,0 +1,78 @@
+"""Per-worker LRUCache vs the shared SQLiteCache for the page cache.
+
+Fills each with `keys` rendered-page-sized entries and reports hit latency
+(one process, then `workers` processes reading at once), the memory the
+cached pages take across all workers, and the misses it takes to warm
+every worker.
+
+    python -m benchmarks.cache_benchmark [keys] [workers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from markupsafe import Markup
+
+from cache import LRUCache, SQLiteCache
+
+PAGE_BYTES = 12000
+LOOKUPS = 20000
+
+
+def page(key):
+    content = Markup('<div class="tile">{}</div>'.format(key)) * (PAGE_BYTES // 30)
+    return {'title': Markup('Fyyur | Page {}'.format(key)), 'content': content}
+
+
+def fill(cache, keys):
+    for key in range(keys):
+        value = page(key)
+        cache.set(('page', key), value, ('show', 'venue'), size=len(value['content']))
+
+
+def hit_latency(cache, keys, lookups=LOOKUPS):
+    start = time.perf_counter()
+    for i in range(lookups):
+        cache.get(('page', i % keys))
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def worker(path, keys, results):
+    results.put(hit_latency(SQLiteCache(path), keys))
+
+
+def main(keys=200, workers=4):
+    tracemalloc.start()
+    local = LRUCache(max_entries=keys, max_bytes=2 ** 31)
+    fill(local, keys)
+    local_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory(dir=directory) as folder:
+        path = os.path.join(folder, 'pages.sqlite')
+        shared = SQLiteCache(path, max_entries=keys, max_bytes=2 ** 31)
+        fill(shared, keys)
+        shared_bytes = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, keys, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        concurrent = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        print('keys={} workers={} page={}KiB'.format(keys, workers, PAGE_BYTES // 1024))
+        print('{:>10} {:>12} {:>16} {:>12} {:>14}'.format('', 'hit (1 proc)', 'hit ({} procs)'.format(workers), 'memory', 'warm-up misses'))
+        print('{:>10} {:>10.1f}us {:>14}   {:>8.1f}MiB {:>14}'.format(
+            'per-worker', hit_latency(local, keys), '-', local_bytes * workers / 2 ** 20, keys * workers))
+        print('{:>10} {:>10.1f}us {:>12.1f}us   {:>8.1f}MiB {:>14}'.format(
+            'shared', hit_latency(shared, keys), sum(concurrent) / len(concurrent), shared_bytes / 2 ** 20, keys))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
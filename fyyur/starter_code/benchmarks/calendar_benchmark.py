@@ -0,0 +1,89 @@
+"""Calendar range queries over a synthetic show table.
+
+Builds a throwaway SQLite database with the app's schema (1,000,000 shows
+over three years by default) and times one page of the /api/calendar query
+for a few filter combinations, against the same filters without a range
+(what pulling the whole show table costs).
+
+    python -m benchmarks.calendar_benchmark [shows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from app import app, db, calendar_query, Show, Venue, Artist, Genre, artist_genre
+
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'MA', 'OR', 'CO', 'FL', 'GA']
+GENRES = ['Jazz', 'Rock n Roll', 'Classical', 'Folk', 'Hip-Hop', 'Blues', 'Electronic', 'Country']
+FIRST_DAY = datetime(2026, 1, 1)
+DAYS = 3 * 365
+
+
+def populate(connection, shows, venues=10000, artists=50000, seed=0):
+    rng = random.Random(seed)
+    connection.execute(Genre.__table__.insert(), [
+        {'id': key, 'name': name} for key, name in enumerate(GENRES, 1)])
+    connection.execute(Venue.__table__.insert(), [
+        {'id': key, 'name': 'Venue {}'.format(key), 'state': rng.choice(STATES),
+         'city': 'City {}'.format(rng.randint(1, 200))} for key in range(1, venues + 1)])
+    connection.execute(Artist.__table__.insert(), [
+        {'id': key, 'name': 'Artist {}'.format(key)} for key in range(1, artists + 1)])
+    connection.execute(artist_genre.insert(), [
+        {'artist_id': key, 'genre_id': genre}
+        for key in range(1, artists + 1)
+        for genre in rng.sample(range(1, len(GENRES) + 1), 2)])
+    keys = set()
+    while len(keys) < shows:
+        keys.add((rng.randint(1, venues), rng.randint(1, artists),
+                  FIRST_DAY + timedelta(days=rng.randrange(DAYS), minutes=30 * rng.randrange(48))))
+    keys = list(keys)
+    for offset in range(0, len(keys), 50000):
+        connection.execute(Show.__table__.insert(), [
+            {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+            for venue_id, artist_id, start_time in keys[offset:offset + 50000]])
+
+
+def timed(connection, statement, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = connection.execute(statement).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000, len(rows)
+
+
+def main(shows=1000000, per_page=50):
+    path = os.path.join(tempfile.mkdtemp(), 'calendar.db')
+    engine = create_engine('sqlite:///' + path)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        start = time.perf_counter()
+        populate(connection, shows)
+        print('shows={} build={:.1f}s'.format(shows, time.perf_counter() - start))
+
+    weekend = date(2027, 5, 21)
+    cases = [
+        ('week', {}),
+        ('weekend CA', {'state': 'CA'}),
+        ('weekend CA Jazz', {'state': 'CA', 'genre': 'Jazz'}),
+        ('venue 42', {'venue_id': 42}),
+        ('artist 4242', {'artist_id': 4242}),
+    ]
+    order = [Show.start_time, Show.venue_id, Show.artist_id]
+    with app.app_context(), engine.connect() as connection:
+        for label, filters in cases:
+            end = weekend + timedelta(days=3 if label.startswith('weekend') else 7)
+            ranged = calendar_query(weekend, end, **filters).order_by(*order).limit(per_page + 1)
+            whole = calendar_query(datetime.min, datetime.max, **filters).order_by(*order)
+            ranged_ms, found = timed(connection, ranged.statement)
+            whole_ms, _ = timed(connection, whole.statement, repeat=1)
+            print('{:>16} page={:7.2f}ms whole_table={:9.2f}ms rows={}'.format(
+                label, ranged_ms, whole_ms, found))
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,44 @@
+"""Per-row cost of the `datetime` Jinja filter on a long /shows page.
+
+Formats 50,000 show start times with the compiled formatter behind the
+filter (dates.py) and with a plain babel.dates.format_datetime call per
+row, as the filter did before, and checks both produce the same strings.
+
+    python -m benchmarks.datetime_benchmark [rows]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+
+from dates import CompiledDateFormat
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+def per_row(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def main(rows=50000):
+    first = datetime(2026, 1, 1, 20, 0)
+    values = [first + timedelta(minutes=37 * i) for i in range(rows)]
+    for name, pattern in sorted(DATETIME_FORMATS.items()):
+        compiled_format = CompiledDateFormat(pattern)
+        assert all(compiled_format(value) == babel.dates.format_datetime(value, pattern)
+                   for value in values)
+        baseline = per_row(lambda value: babel.dates.format_datetime(value, pattern), values)
+        compiled = per_row(compiled_format, values)
+        print('{:>6}: babel={:6.1f}us/row compiled={:6.1f}us/row page={:.0f}ms -> {:.0f}ms'.format(
+            name, baseline, compiled, baseline * rows / 1000, compiled * rows / 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,67 @@
+"""Substring search over a synthetic venue/artist catalog.
+
+Compares the in-process n-gram index used on SQLite against a linear
+casefolded scan (what ILIKE '%term%' does without an index).
+
+    python -m benchmarks.search_benchmark [rows]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from search import NgramIndex, normalize
+
+WORDS = [
+    'the', 'musical', 'hop', 'park', 'square', 'live', 'music', 'coffee',
+    'dueling', 'pianos', 'bar', 'guns', 'petals', 'wild', 'sax', 'band',
+    'blue', 'note', 'velvet', 'lounge', 'hall', 'club', 'room', 'garden',
+    'electric', 'ballroom', 'tavern', 'house', 'stage', 'theatre', 'cellar',
+]
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'tor', 'vex', 'zu', 'bri', 'dal', 'fen', 'gri', 'hol', 'jun', 'pra', 'sel', 'wyn']
+TERMS = ['Hop', 'music', 'Sax Band', 'velvet lounge', 'torvex', 'a', 'zzz']
+
+
+def catalog(rows, seed=0):
+    # a few common venue words mixed with a long tail of invented ones
+    rng = random.Random(seed)
+    vocabulary = WORDS + [
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        for _ in range(5000)]
+    for key in range(1, rows + 1):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(2, 4))]
+        yield key, ' '.join(words).title() + ' {}'.format(rng.randint(1, 999))
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main(rows=1000000, limit=50):
+    names = list(catalog(rows))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = NgramIndex()
+    for key, name in names:
+        index.add(key, name)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    print('rows={} build={:.1f}s index_memory={:.0f}MiB grams={}'.format(
+        rows, build, memory, len(index.postings)))
+
+    folded = [(key, normalize(name)) for key, name in names]
+    for term in TERMS:
+        needle = normalize(term)
+        indexed, found = timed(lambda: index.search(term, limit), 5)
+        scanned, _ = timed(lambda: [key for key, name in folded if needle in name][:limit], 1)
+        print('{:>15} index={:8.2f}ms scan={:8.2f}ms results={}'.format(
+            repr(term), indexed, scanned, len(found)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,260 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """In-process LRU cache with tag invalidation.
+
+    Entries are evicted least-recently-used first once either `max_entries`
+    or `max_bytes` (the summed `size` of stored values) is exceeded.
+    Each entry can carry tags; `invalidate(tag)` drops every entry with it
+    and `last_invalidated(tag)` tells when that last happened.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=8 * 2 ** 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.invalidated_at = {}
+        self.size = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tags=(), size=None):
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (value, size, tuple(tags))
+            self.size += size
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop the entries with any of `tags`.
+
+        Returns the time recorded as their invalidation, later than any
+        before it, and {tag: previous invalidation time}.
+        """
+        with self.lock:
+            previous = {tag: self.invalidated_at.get(tag, 0) for tag in tags}
+            now = invalidation_time(previous)
+            for tag in tags:
+                self.invalidated_at[tag] = now
+                for key in self.tags.pop(tag, ()):
+                    if self._discard(key):
+                        self.invalidations += 1
+        return now, previous
+
+    def last_invalidated(self, *tags):
+        return max([self.invalidated_at.get(tag, 0) for tag in tags] or [0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        value, size, tags = entry
+        self.size -= size
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+        return True
+
+
+def invalidation_time(previous):
+    # strictly after every earlier invalidation of the same tags, so that
+    # readers comparing times never miss one, even across clock steps
+    return max([time.time()] + [at + 1e-6 for at in previous.values()])
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entry_used ON cache_entry (used);
+CREATE TABLE IF NOT EXISTS cache_tag (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_cache_tag_key ON cache_tag (key);
+CREATE TABLE IF NOT EXISTS cache_invalidation (
+    tag TEXT PRIMARY KEY,
+    at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteCache(object):
+    """LRUCache's interface over a SQLite file shared by every process on
+    the host, for pre-forked workers that would otherwise each warm their
+    own cache (and miss each other's invalidations).
+
+    Values are pickled and sized by their pickled length, so the `size`
+    that `set()` accepts for LRUCache compatibility is ignored. Reads go
+    through SQLite's memory map; recency is written back at most every
+    `touch_interval` seconds per entry, so hits rarely take the write lock.
+    Entries older than `ttl` seconds are misses. Invalidation times are
+    stored in the file too, so `last_invalidated` sees every process's.
+    Counters in `stats()` are per process.
+    """
+
+    def __init__(self, path, max_entries=256, max_bytes=8 * 2 ** 20, ttl=None,
+                 touch_interval=1.0, mmap_bytes=64 * 2 ** 20):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.mmap_bytes = mmap_bytes
+        self.local = threading.local()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        with self.connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def connection(self):
+        # one connection per thread, reopened in a forked child
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA mmap_size={}'.format(int(self.mmap_bytes)))
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, key):
+        key = repr(key)
+        now = time.time()
+        connection = self.connection()
+        row = connection.execute(
+            'SELECT value, expires, used FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            self.misses += 1
+            return None
+        if now - row[2] >= self.touch_interval:
+            connection.execute('UPDATE cache_entry SET used = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value, tags=(), size=None):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_bytes:
+            return
+        key = repr(key)
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        connection = self.connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, value, size, expires, used) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), expires, now))
+            connection.executemany(
+                'INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)', [(tag, key) for tag in set(tags)])
+            self._evict(connection, now)
+
+    def invalidate(self, *tags):
+        connection = self.connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            previous = dict.fromkeys(tags, 0)
+            previous.update(connection.execute('SELECT tag, at FROM cache_invalidation WHERE tag IN ({})'.format(
+                ', '.join('?' * len(tags))), tags))
+            now = invalidation_time(previous)
+            for tag in tags:
+                connection.execute('INSERT OR REPLACE INTO cache_invalidation (tag, at) VALUES (?, ?)', (tag, now))
+                keys = [key for key, in connection.execute('SELECT key FROM cache_tag WHERE tag = ?', (tag,))]
+                self.invalidations += self._discard(connection, keys)
+        return now, previous
+
+    def last_invalidated(self, *tags):
+        if not tags:
+            return 0
+        at, = self.connection().execute('SELECT max(at) FROM cache_invalidation WHERE tag IN ({})'.format(
+            ', '.join('?' * len(tags))), tags).fetchone()
+        return at or 0
+
+    def clear(self):
+        connection = self.connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM cache_tag')
+            connection.execute('DELETE FROM cache_entry')
+
+    def stats(self):
+        entries, size = self.connection().execute('SELECT count(*), total(size) FROM cache_entry').fetchone()
+        return {
+            'entries': entries,
+            'bytes': int(size),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _evict(self, connection, now):
+        expired = [key for key, in connection.execute(
+            'SELECT key FROM cache_entry WHERE expires <= ?', (now,))]
+        self._discard(connection, expired)
+        entries, size = connection.execute('SELECT count(*), total(size) FROM cache_entry').fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        victims = []
+        for key, entry_size in connection.execute('SELECT key, size FROM cache_entry ORDER BY used'):
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            victims.append(key)
+            entries -= 1
+            size -= entry_size
+        self.evictions += self._discard(connection, victims)
+
+    def _discard(self, connection, keys):
+        discarded = 0
+        for key in keys:
+            connection.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+            discarded += connection.execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount
+        return discarded
@@ -14,3 +14,88 @@ SQLALCHEMY_DATABASE_URI = 'postgresql://gavin@localhost:5432/fyyur'
 
 
 WTF_CSRF_TIME_LIMIT = None
+
+# Maximum number of venue/artist search results, best matches first
+SEARCH_RESULT_LIMIT = 50
+
+# Rows per page on the /venues, /artists and /shows listings
+PAGE_SIZE = 50
+
+# Cache of the rendered home, /venues, /artists and /shows pages
+PAGE_CACHE_MAX_ENTRIES = 256
+PAGE_CACHE_MAX_BYTES = 8 * 1024 * 1024
+# SQLite file holding a page cache shared by all workers on the host (put it
+# on tmpfs, e.g. /dev/shm/fyyur-pages.sqlite); None keeps one per process
+PAGE_CACHE_PATH = None
+# Seconds a shared cache entry lives, as a bound on staleness; None keeps it
+# until it is invalidated or evicted
+PAGE_CACHE_TTL = 300
+
+# Log a possible N+1 when one statement runs this many times in a request
+QUERY_REPEAT_THRESHOLD = 5
+
+# How long a show holds its venue and artist when checking for double bookings
+BOOKING_SLOT_MINUTES = 180
+
+# Longest date range, in days, a single /api/calendar request may cover
+CALENDAR_MAX_DAYS = 92
+
+# Shows that started more than this many days ago are moved to show_archive
+# by `flask fyyur archive`
+SHOW_ARCHIVE_AFTER_DAYS = 365
+
+# Past shows listed on a venue or artist page, newest first
+SHOW_HISTORY_LIMIT = 20
+
+# Monthly partitions of the show table kept ahead of the current month (PostgreSQL)
+SHOW_PARTITION_MONTHS_AHEAD = 12
+
+# Output of `flask fyyur assets` (fingerprinted, precompressed static files);
+# None means static/dist
+ASSETS_FOLDER = None
+
+# Compiled templates are cached here across restarts (None disables it);
+# fill it at build time with `flask fyyur warm`
+JINJA_BYTECODE_CACHE_DIR = os.path.join(basedir, '.jinja_cache')
+
+# Compile every template when a worker starts instead of on first use
+PRECOMPILE_TEMPLATES = False
+
+# Database URL for the async read path in asgi.py; None derives it from
+# SQLALCHEMY_DATABASE_URI (postgresql+asyncpg / sqlite+aiosqlite)
+ASYNC_DATABASE_URI = None
+
+# Read replicas for GET and HEAD requests; empty sends everything to the primary
+SQLALCHEMY_REPLICA_URIS = []
+
+# Seconds between health checks of a replica, and the replay lag (PostgreSQL)
+# past which it is skipped
+REPLICA_CHECK_INTERVAL = 5
+REPLICA_MAX_LAG_SECONDS = 5
+
+# After a write, that client's reads (and page cache refills of the written
+# tables) go to the primary for this many seconds
+REPLICA_READ_YOUR_WRITES_SECONDS = 5
+
+# Suggested artists on a venue page, and venues on an artist page
+MATCH_SUGGESTION_LIMIT = 6
+
+# Most names returned by /api/venues/autocomplete and /api/artists/autocomplete
+AUTOCOMPLETE_LIMIT = 10
+
+# Load the autocomplete name indexes when a worker starts instead of on the
+# first lookup
+PRELOAD_NAME_INDEXES = True
+
+# Outside debug mode, log to LOG_FILE as JSON lines (with request id, route
+# and duration) written by a background thread; False keeps the plain
+# synchronous file handler
+LOG_ASYNC = True
+LOG_FILE = 'error.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Records waiting for the writer thread; more are dropped and counted
+LOG_QUEUE_SIZE = 10000
+
+# Template output pieces collected into each chunk of a streamed page
+STREAM_BUFFER_CHUNKS = 64
@@ -0,0 +1,69 @@
+from datetime import timezone
+from functools import lru_cache
+
+from babel import Locale
+from babel.dates import LC_TIME, get_timezone, parse_pattern, tokenize_pattern, untokenize_pattern
+
+# pattern fields that only depend on the calendar date or on the time of day
+DATE_FIELDS = set('GyYuUQqMLlwWdDFgEec')
+TIME_FIELDS = set('abBhHKkmsSA')
+
+
+def field_kind(token):
+    field = token[1][0]
+    if field in DATE_FIELDS:
+        return 'date'
+    if field in TIME_FIELDS:
+        return 'time'
+    return 'datetime'
+
+
+class CompiledDateFormat(object):
+    """A babel date pattern compiled once for a locale and timezone.
+
+    The pattern is split into runs of date-only and time-only fields. Each
+    run is formatted through an LRU cache keyed by `value.date()` or
+    `value.timetz()`, so a long listing pays babel's per-field cost once per
+    distinct day and time instead of once per row. Output matches
+    `babel.dates.format_datetime(value, pattern, tzinfo=tz, locale=locale)`.
+    """
+
+    def __init__(self, pattern, locale=None, tz=None, cache_size=4096):
+        self.locale = Locale.parse(locale or LC_TIME)
+        self.tzinfo = get_timezone(tz) if tz else None
+        self.parts = []
+
+        runs = []
+        for token in tokenize_pattern(pattern):
+            kind = field_kind(token) if token[0] == 'field' else None
+            if runs and (kind is None or runs[-1][0] in (None, kind)):
+                if runs[-1][0] is None:
+                    runs[-1][0] = kind
+                runs[-1][1].append(token)
+            else:
+                runs.append([kind, [token]])
+        for kind, tokens in runs:
+            if kind is None:
+                self.parts.append((None, ''.join(value for _, value in tokens)))
+            else:
+                compiled = parse_pattern(untokenize_pattern(tokens))
+                apply = lru_cache(maxsize=cache_size)(
+                    lambda value, compiled=compiled: compiled.apply(value, self.locale))
+                self.parts.append((kind, apply))
+
+    def __call__(self, value):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        if self.tzinfo is not None:
+            value = value.astimezone(self.tzinfo)
+        formatted = []
+        for kind, part in self.parts:
+            if kind is None:
+                formatted.append(part)
+            elif kind == 'date':
+                formatted.append(part(value.date()))
+            elif kind == 'time':
+                formatted.append(part(value.timetz()))
+            else:
+                formatted.append(part(value))
+        return ''.join(formatted)
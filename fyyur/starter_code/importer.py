@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+
+# rows per multi-row upsert; a few columns each stays under the bind
+# parameter limits (999 on older SQLite)
+UPSERT_BATCH_ROWS = 200
+
+
+def read_rows(path):
+    """Yield (line number, row dict) from a .csv or .jsonl/.ndjson file, lazily."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.csv'):
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(source, 1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RejectWriter(object):
+    """Writes rejected rows as JSON lines, with the reason, opened on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.count = 0
+
+    def write(self, line_number, row, errors):
+        if self.file is None:
+            self.file = open(self.path, 'w', encoding='utf-8')
+        self.count += 1
+        record = dict(row, _line=line_number, _errors=errors)
+        self.file.write(json.dumps(record, default=str) + '\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class ImportStats(object):
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = self.imported = 0
+
+    def rate(self):
+        return self.read / max(time.perf_counter() - self.started, 1e-9)
+
+
+def allocate_ids(connection, table, count):
+    """Reserve `count` primary keys for `table` before a bulk insert."""
+    if not count:
+        return []
+    if connection.dialect.name == 'postgresql':
+        return [row[0] for row in connection.execute(text(
+            "SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+            {'table': table.name, 'count': count})]
+    first = connection.execute(text('SELECT COALESCE(MAX(id), 0) FROM {}'.format(table.name))).scalar() + 1
+    return list(range(first, first + count))
+
+
+def copy_rows(connection, table, rows):
+    """Insert dict rows with COPY on PostgreSQL, executemany elsewhere."""
+    if not rows:
+        return
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'.format(
+            table.name, ', '.join(columns)), buffer)
+    finally:
+        cursor.close()
+
+
+def upsert_rows(connection, table, rows, key, update=None):
+    """INSERT ... ON CONFLICT (key) DO UPDATE, on PostgreSQL and SQLite.
+
+    `update` maps the columns to set on a conflicting row to their new
+    values; by default every other column takes the proposed row's value.
+    Rows go in multi-row statements of up to `UPSERT_BATCH_ROWS`.
+    """
+    dialect = {'postgresql': postgresql, 'sqlite': sqlite}[connection.dialect.name]
+    for batch in batches(rows, UPSERT_BATCH_ROWS):
+        statement = dialect.insert(table).values(batch)
+        columns = update
+        if columns is None:
+            columns = {column: statement.excluded[column] for column in batch[0] if column not in key}
+        connection.execute(statement.on_conflict_do_update(index_elements=key, set_=columns))
@@ -0,0 +1,139 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# request fields copied onto every record logged while handling a request
+REQUEST_FIELDS = ('request_id', 'method', 'route', 'path')
+# fields a record may carry through `extra=`
+EXTRA_FIELDS = ('status', 'duration_ms', 'dropped')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, the request
+    fields and any traceback."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in REQUEST_FIELDS + EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestFilter(logging.Filter):
+    # runs in the request's thread, before the record is queued
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule else None
+            record.path = request.path
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when its queue is
+    full. `dropped` counts them, and the next record that fits is preceded by
+    a warning with the count so far."""
+
+    def __init__(self, maxsize):
+        super(BoundedQueueHandler, self).__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.reported = 0
+
+    def prepare(self, record):
+        # renders the message and traceback here, while the arguments are
+        # still current, but keeps the record's fields for JsonFormatter
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # called under the handler's lock, so the counters need no other
+        try:
+            if self.dropped != self.reported:
+                self.report_dropped()
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def report_dropped(self):
+        record = logging.LogRecord(
+            'fyyur.logging', logging.WARNING, __file__, 0, '%d log records dropped', (self.dropped,), None)
+        record.dropped = self.dropped
+        self.queue.put_nowait(record)
+        self.reported = self.dropped
+
+
+def init_logging(app):
+    """Log to LOG_FILE as JSON lines written by a background thread.
+
+    Request threads only put records on a queue of LOG_QUEUE_SIZE, dropping
+    them when it is full, and a QueueListener writes them to a file rotated
+    at LOG_MAX_BYTES. Each request is logged once with its status and
+    duration, and carries an X-Request-ID (taken from the request when set).
+    """
+    file_handler = RotatingFileHandler(
+        app.config.get('LOG_FILE', 'error.log'),
+        maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+        backupCount=app.config.get('LOG_BACKUP_COUNT', 5))
+    file_handler.setFormatter(JsonFormatter())
+    handler = BoundedQueueHandler(app.config.get('LOG_QUEUE_SIZE', 10000))
+    handler.addFilter(RequestFilter())
+    listener = QueueListener(handler.queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def restart_listener():
+        # a forked worker has the queue but not the writer thread
+        handler.queue = listener.queue = queue.Queue(handler.queue.maxsize)
+        listener._thread = None
+        listener.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=restart_listener)
+
+    app.logger.setLevel(logging.INFO)
+    # Flask's stderr handler would still write on the request thread
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.extensions['fyyur_logging'] = handler
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            duration = (time.perf_counter() - started) * 1000
+            app.logger.info('%s %s %s', request.method, request.path, response.status_code,
+                            extra={'status': response.status_code, 'duration_ms': round(duration, 1)})
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    return handler
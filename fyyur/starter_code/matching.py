@@ -0,0 +1,82 @@
+import heapq
+
+# score of a suggested match: a shared city (or only state), each shared
+# genre, and each past show together, counted up to COBOOKED_CAP shows
+CITY_WEIGHT = 4
+STATE_WEIGHT = 2
+GENRE_WEIGHT = 3
+COBOOKED_WEIGHT = 2
+COBOOKED_CAP = 3
+
+
+def normalize(text):
+    return (text or '').strip().casefold()
+
+
+class MatchIndex(object):
+    """In-process inverted index of the venues or artists open to bookings.
+
+    Each entry is posted under (state, city, genre) for each of its genres,
+    under (state, None, genre) for a state-wide genre match, and under
+    (state, city, None) for a same-city match without a shared genre.
+    `suggest` only scores the entries in the postings a profile shares, plus
+    the counterparts it has played with before.
+    """
+
+    def __init__(self):
+        self.profiles = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def posting_keys(self, city, state, genres):
+        keys = {(state, city, None)}
+        for genre in genres:
+            keys.add((state, city, genre))
+            keys.add((state, None, genre))
+        return keys
+
+    def add(self, key, city, state, genres):
+        profile = (normalize(city), normalize(state), frozenset(genres))
+        if self.profiles.get(key) == profile:
+            return
+        self.remove(key)
+        self.profiles[key] = profile
+        for posting_key in self.posting_keys(*profile):
+            self.postings.setdefault(posting_key, set()).add(key)
+
+    def remove(self, key):
+        profile = self.profiles.pop(key, None)
+        if profile is None:
+            return
+        for posting_key in self.posting_keys(*profile):
+            posting = self.postings[posting_key]
+            posting.discard(key)
+            if not posting:
+                del self.postings[posting_key]
+
+    def score(self, profile, key, cobooked):
+        city, state, genres = profile
+        other_city, other_state, other_genres = self.profiles[key]
+        score = 0
+        if state and state == other_state:
+            score += CITY_WEIGHT if city and city == other_city else STATE_WEIGHT
+        score += GENRE_WEIGHT * len(genres & other_genres)
+        score += COBOOKED_WEIGHT * min(cobooked.get(key, 0), COBOOKED_CAP)
+        return score
+
+    def suggest(self, city, state, genres, cobooked=None, limit=10):
+        """Return up to `limit` (key, score) pairs, best matches first.
+
+        `cobooked` maps counterpart keys to the number of past shows
+        together. Ties go to the lower key.
+        """
+        profile = (normalize(city), normalize(state), frozenset(genres))
+        cobooked = cobooked or {}
+        candidates = set(key for key in cobooked if key in self.profiles)
+        for posting_key in self.posting_keys(*profile):
+            candidates.update(self.postings.get(posting_key, ()))
+        ranked = heapq.nsmallest(limit, (
+            (-self.score(profile, key, cobooked), key) for key in candidates))
+        return [(key, -score) for score, key in ranked if score]
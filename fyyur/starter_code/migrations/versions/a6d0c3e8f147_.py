@@ -0,0 +1,31 @@
+"""venue and artist version counters
+
+Revision ID: a6d0c3e8f147
+Revises: f5b1d7e93a26
+Create Date: 2026-10-18 20:11:47.902116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d0c3e8f147'
+down_revision = 'f5b1d7e93a26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute('UPDATE {} SET updated_at = CURRENT_TIMESTAMP'.format(table))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False, server_default=sa.func.now())
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
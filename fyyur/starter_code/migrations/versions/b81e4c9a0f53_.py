@@ -0,0 +1,54 @@
+"""venue and artist show summaries
+
+Revision ID: b81e4c9a0f53
+Revises: a3c1f0d2b7e4
+Create Date: 2026-10-18 10:41:27.530918
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81e4c9a0f53'
+down_revision = 'a3c1f0d2b7e4'
+branch_labels = None
+depends_on = None
+
+
+def create_summary(entity):
+    table = '{}_show_summary'.format(entity)
+    key = '{}_id'.format(entity)
+    op.create_table(table,
+    sa.Column(key, sa.Integer(), nullable=False),
+    sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+    sa.Column('past_shows_count', sa.Integer(), nullable=False),
+    sa.Column('next_show_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint([key], ['{}.id'.format(entity)], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint(key)
+    )
+    op.create_index(op.f('ix_{}_next_show_time'.format(table)), table, ['next_show_time'], unique=False)
+
+    # backfill from the existing shows
+    op.execute(sa.text(
+        'INSERT INTO {table} ({key}, upcoming_shows_count, past_shows_count, next_show_time) '
+        'SELECT {key}, '
+        'SUM(CASE WHEN start_time > :now THEN 1 ELSE 0 END), '
+        'SUM(CASE WHEN start_time > :now THEN 0 ELSE 1 END), '
+        'MIN(CASE WHEN start_time > :now THEN start_time END) '
+        'FROM show GROUP BY {key}'.format(table=table, key=key)
+    ).bindparams(now=datetime.now()))
+
+
+def upgrade():
+    create_summary('venue')
+    create_summary('artist')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_artist_show_summary_next_show_time'), table_name='artist_show_summary')
+    op.drop_table('artist_show_summary')
+    op.drop_index(op.f('ix_venue_show_summary_next_show_time'), table_name='venue_show_summary')
+    op.drop_table('venue_show_summary')
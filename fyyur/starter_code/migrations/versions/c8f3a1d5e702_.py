@@ -0,0 +1,26 @@
+"""venue and artist row_version for edit conflicts
+
+Revision ID: c8f3a1d5e702
+Revises: a6d0c3e8f147
+Create Date: 2026-10-18 21:02:35.417093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f3a1d5e702'
+down_revision = 'a6d0c3e8f147'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'row_version')
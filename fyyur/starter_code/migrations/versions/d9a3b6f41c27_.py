@@ -0,0 +1,82 @@
+"""normalize venue and artist genres
+
+Revision ID: d9a3b6f41c27
+Revises: c4d27e8b15a9
+Create Date: 2026-10-18 15:22:10.873356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a3b6f41c27'
+down_revision = 'c4d27e8b15a9'
+branch_labels = None
+depends_on = None
+
+genre = sa.table('genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def link_table(entity):
+    return sa.table('{}_genre'.format(entity),
+        sa.column('{}_id'.format(entity), sa.Integer),
+        sa.column('genre_id', sa.Integer))
+
+
+def split_genres(genres):
+    return {name.strip() for name in (genres or '').split(',') if name.strip()}
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for entity in ('venue', 'artist'):
+        op.create_table('{}_genre'.format(entity),
+        sa.Column('{}_id'.format(entity), sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.ForeignKeyConstraint(['{}_id'.format(entity)], ['{}.id'.format(entity)], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('{}_id'.format(entity), 'genre_id')
+        )
+        op.create_index('ix_{0}_genre_genre_id_{0}_id'.format(entity), '{}_genre'.format(entity), ['genre_id', '{}_id'.format(entity)], unique=False)
+        op.create_index('ix_{}_city_state'.format(entity), entity, ['city', 'state'], unique=False)
+
+    # backfill from the comma-joined columns
+    conn = op.get_bind()
+    rows = {entity: conn.execute(sa.text('SELECT id, genres FROM {}'.format(entity))).fetchall()
+            for entity in ('venue', 'artist')}
+    names = sorted({name for entity_rows in rows.values() for _, genres in entity_rows
+                    for name in split_genres(genres)})
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict(conn.execute(sa.text('SELECT name, id FROM genre')).fetchall())
+    for entity, entity_rows in rows.items():
+        links = [{'{}_id'.format(entity): entity_id, 'genre_id': genre_ids[name]}
+                 for entity_id, genres in entity_rows for name in split_genres(genres)]
+        if links:
+            op.bulk_insert(link_table(entity), links)
+        op.drop_column(entity, 'genres')
+
+
+def downgrade():
+    conn = op.get_bind()
+    for entity in ('artist', 'venue'):
+        op.add_column(entity, sa.Column('genres', sa.String(length=120), nullable=True))
+        rows = conn.execute(sa.text(
+            'SELECT l.{0}_id, g.name FROM {0}_genre l JOIN genre g ON g.id = l.genre_id '
+            'ORDER BY l.{0}_id, g.name'.format(entity))).fetchall()
+        genres = {}
+        for entity_id, name in rows:
+            genres.setdefault(entity_id, []).append(name)
+        for entity_id, names in genres.items():
+            conn.execute(sa.text('UPDATE {} SET genres = :genres WHERE id = :id'.format(entity)),
+                         {'genres': ','.join(names), 'id': entity_id})
+        op.drop_index('ix_{}_city_state'.format(entity), table_name=entity)
+        op.drop_index('ix_{0}_genre_genre_id_{0}_id'.format(entity), table_name='{}_genre'.format(entity))
+        op.drop_table('{}_genre'.format(entity))
+    op.drop_table('genre')
@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: e2f85a7c3d10
+Revises: d9a3b6f41c27
+Create Date: 2026-10-18 17:48:31.604215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f85a7c3d10'
+down_revision = 'd9a3b6f41c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_venue_id_artist_id', 'show', ['start_time', 'venue_id', 'artist_id'], unique=False)
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+    op.drop_index('ix_venue_city_state', table_name='venue')
+    op.create_index('ix_venue_city_state_id', 'venue', ['city', 'state', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_city_state_id', table_name='venue')
+    op.create_index('ix_venue_city_state', 'venue', ['city', 'state'], unique=False)
+    op.drop_index('ix_artist_name_id', table_name='artist')
+    op.drop_index('ix_show_start_time_venue_id_artist_id', table_name='show')
@@ -0,0 +1,25 @@
+"""show_archive start_time index for the calendar and export
+
+Revision ID: e7b2c94f1a38
+Revises: c8f3a1d5e702
+Create Date: 2026-10-18 23:14:09.528310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c94f1a38'
+down_revision = 'c8f3a1d5e702'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_archive_start_time_venue_id_artist_id', 'show_archive',
+                    ['start_time', 'venue_id', 'artist_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_archive_start_time_venue_id_artist_id', table_name='show_archive')
@@ -0,0 +1,81 @@
+"""monthly show partitions and show archive
+
+Revision ID: f5b1d7e93a26
+Revises: e2f85a7c3d10
+Create Date: 2026-10-18 19:04:12.318840
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b1d7e93a26'
+down_revision = 'e2f85a7c3d10'
+branch_labels = None
+depends_on = None
+
+SHOW_INDEXES = (
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_show_start_time_venue_id_artist_id', ['start_time', 'venue_id', 'artist_id']),
+)
+
+
+def month_start(value, months=0):
+    month = value.year * 12 + value.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def rebuild_show(partitioned):
+    # copies `show` into a new table (partitioned by month or plain), then
+    # swaps it in and restores the keys and indexes
+    conn = op.get_bind()
+    op.execute(
+        'CREATE TABLE show_new (venue_id integer NOT NULL, artist_id integer NOT NULL,'
+        ' start_time timestamp without time zone NOT NULL)'
+        + (' PARTITION BY RANGE (start_time)' if partitioned else ''))
+    if partitioned:
+        op.execute('CREATE TABLE show_default PARTITION OF show_new DEFAULT')
+        now = datetime.now()
+        first = conn.execute(sa.text('SELECT min(start_time) FROM show')).scalar() or now
+        month, last = month_start(first), month_start(now, 12)
+        while month <= last:
+            op.execute("CREATE TABLE {} PARTITION OF show_new FOR VALUES FROM ('{}') TO ('{}')".format(
+                month.strftime('show_y%Ym%m'), month.isoformat(), month_start(month, 1).isoformat()))
+            month = month_start(month, 1)
+    op.execute('INSERT INTO show_new (venue_id, artist_id, start_time) SELECT venue_id, artist_id, start_time FROM show')
+    op.execute('DROP TABLE show')
+    op.execute('ALTER TABLE show_new RENAME TO show')
+    op.create_primary_key('show_pkey', 'show', ['venue_id', 'artist_id', 'start_time'])
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'])
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'])
+    for name, columns in SHOW_INDEXES:
+        op.create_index(name, 'show', columns, unique=False)
+
+
+def upgrade():
+    op.create_table('show_archive',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'artist_id', 'start_time')
+    )
+    op.create_index('ix_show_archive_venue_id_start_time', 'show_archive', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_archive_artist_id_start_time', 'show_archive', ['artist_id', 'start_time'], unique=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        rebuild_show(partitioned=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        rebuild_show(partitioned=False)
+    # archived shows go back into the show table
+    op.execute('INSERT INTO show (venue_id, artist_id, start_time) SELECT venue_id, artist_id, start_time FROM show_archive')
+    op.drop_index('ix_show_archive_artist_id_start_time', table_name='show_archive')
+    op.drop_index('ix_show_archive_venue_id_start_time', table_name='show_archive')
+    op.drop_table('show_archive')
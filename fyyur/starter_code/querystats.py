@@ -0,0 +1,114 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# every collector active in the current context sees each statement
+active_collectors = ContextVar('query_collectors', default=())
+
+
+class QueryCollector(object):
+    """Counts statements, total database time and repeated statement shapes.
+
+    Statements reach the engine with bound parameters, so identical text is
+    the same shape: a lazy load issued once per row shows up as one shape
+    repeated N times.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[' '.join(statement.split())] += 1
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def push_collector():
+    collector = QueryCollector()
+    return collector, active_collectors.set(active_collectors.get() + (collector,))
+
+
+@contextmanager
+def collect_queries():
+    collector, token = push_collector()
+    try:
+        yield collector
+    finally:
+        active_collectors.reset(token)
+
+
+@contextmanager
+def assert_max_queries(n):
+    """Fail with the executed statements if the block runs more than `n` queries.
+
+        with assert_max_queries(3):
+            client.get('/venues')
+    """
+    with collect_queries() as collector:
+        yield collector
+    if collector.count > n:
+        raise AssertionError('{} queries executed, expected at most {}:\n{}'.format(
+            collector.count, n, '\n'.join(
+                '{}x {}'.format(count, shape) for shape, count in collector.shapes.most_common())))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if active_collectors.get():
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    collectors = active_collectors.get()
+    started = conn.info.get('query_started')
+    if collectors and started:
+        duration = time.perf_counter() - started.pop()
+        for collector in collectors:
+            collector.record(statement, duration)
+
+
+def init_query_stats(app):
+    """Count queries per request.
+
+    Adds X-Query-Count / X-Query-Time headers plus a Server-Timing entry,
+    and logs a warning when a statement shape repeats at least
+    QUERY_REPEAT_THRESHOLD times in one request (a likely N+1).
+    """
+    threshold = app.config.get('QUERY_REPEAT_THRESHOLD', 5)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = push_collector()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        collector = stats[0]
+        milliseconds = collector.duration * 1000
+        response.headers['X-Query-Count'] = str(collector.count)
+        response.headers['X-Query-Time'] = '{:.1f}'.format(milliseconds)
+        response.headers.add('Server-Timing', 'db;dur={:.1f};desc="{} queries"'.format(milliseconds, collector.count))
+        app.logger.debug('%s %s: %d queries in %.1fms', request.method, request.path, collector.count, milliseconds)
+        for shape, count in collector.repeated(threshold):
+            app.logger.warning('Possible N+1 in %s %s: %d x %s', request.method, request.path, count, shape)
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(error=None):
+        stats = g.pop('query_stats', None)
+        if stats is not None:
+            active_collectors.set(tuple(
+                collector for collector in active_collectors.get() if collector is not stats[0]))
@@ -0,0 +1,138 @@
+import itertools
+import threading
+import time
+
+from flask import g, has_request_context, request, session as cookie_session
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+
+try:
+    from flask_sqlalchemy import SignallingSession as BaseSession
+except ImportError:  # Flask-SQLAlchemy 3
+    from flask_sqlalchemy.session import Session as BaseSession
+
+
+class ReplicaSet(object):
+    """Read replicas with lazy health checks and round-robin selection.
+
+    A replica is checked with SELECT 1 (and its replay lag on PostgreSQL)
+    when it is chosen and its last check is older than `check_interval`
+    seconds. Failed checks and disconnects mark it down; `choose()` skips
+    it until it passes a check again, and returns None when no replica is
+    healthy so the caller can fall back to the primary.
+    """
+
+    def __init__(self, uris, check_interval=5.0, max_lag=None, engine_options=None):
+        self.engines = [create_engine(uri, **(engine_options or {})) for uri in uris]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.healthy = {engine: True for engine in self.engines}
+        self.checked = {engine: 0.0 for engine in self.engines}
+        self.order = itertools.cycle(self.engines)
+        self.lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, 'handle_error', self.connection_failed)
+
+    def __len__(self):
+        return len(self.engines)
+
+    def choose(self):
+        for _ in range(len(self.engines)):
+            with self.lock:
+                engine = next(self.order)
+            if time.monotonic() - self.checked[engine] >= self.check_interval:
+                self.check(engine)
+            if self.healthy[engine]:
+                return engine
+        return None
+
+    def check(self, engine):
+        self.checked[engine] = time.monotonic()
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == 'postgresql' and self.max_lag is not None:
+                    lag = connection.execute(text(
+                        'SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())')).scalar()
+                    self.healthy[engine] = lag is None or lag <= self.max_lag
+                else:
+                    connection.execute(text('SELECT 1'))
+                    self.healthy[engine] = True
+        except exc.DBAPIError:
+            self.healthy[engine] = False
+        return self.healthy[engine]
+
+    def mark_down(self, engine):
+        self.healthy[engine] = False
+        self.checked[engine] = time.monotonic()
+
+    def connection_failed(self, context):
+        if context.is_disconnect or isinstance(context.original_exception, exc.OperationalError):
+            self.mark_down(context.engine)
+
+    def status(self):
+        return {repr(engine.url): self.healthy[engine] for engine in self.engines}
+
+
+class RoutingSession(BaseSession):
+    """Session that sends reads from GET and HEAD requests to a replica.
+
+    Flushes, DML statements and raw `connection()` use go to the primary,
+    and so does every later read in the same transaction. A commit that
+    wrote pins the client's reads to the primary for
+    REPLICA_READ_YOUR_WRITES_SECONDS (through the session cookie), so the
+    redirect after a form post sees its own change.
+    """
+
+    def __init__(self, db, **options):
+        self.router = db
+        super(RoutingSession, self).__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or clause is None or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+        elif not self.info.get('wrote') and reads_from_replica():
+            engine = self.router.replicas.choose()
+            if engine is not None:
+                return engine
+        return super(RoutingSession, self).get_bind(mapper, clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def pin_reads_to_primary(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        cookie_session['primary_until'] = time.time() + session.router.read_your_writes
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def forget_writes(session):
+    session.info.pop('wrote', None)
+
+
+def reads_from_replica():
+    return (has_request_context() and request.method in ('GET', 'HEAD')
+            and not g.get('read_primary')
+            and cookie_session.get('primary_until', 0) <= time.time())
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy with a RoutingSession over SQLALCHEMY_REPLICA_URIS."""
+
+    def __init__(self, app=None, **kwargs):
+        kwargs.setdefault('session_options', {}).setdefault('class_', RoutingSession)
+        self.replicas = ReplicaSet([])
+        self.read_your_writes = 0
+        super(RoutingSQLAlchemy, self).__init__(app, **kwargs)
+
+    def init_app(self, app):
+        self.replicas = ReplicaSet(
+            app.config.get('SQLALCHEMY_REPLICA_URIS') or [],
+            app.config.get('REPLICA_CHECK_INTERVAL', 5.0),
+            app.config.get('REPLICA_MAX_LAG_SECONDS'))
+        self.read_your_writes = app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', 5.0)
+        super(RoutingSQLAlchemy, self).init_app(app)
+
+    def create_session(self, options):
+        # Flask-SQLAlchemy 2.x; 3.x takes the class from session_options
+        return sessionmaker(db=self, **options)
@@ -0,0 +1,140 @@
+import bisect
+import heapq
+import re
+from array import array
+
+
+def normalize(text):
+    return (text or '').casefold()
+
+
+def ngrams(text, n=3):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NgramIndex(object):
+    """In-process n-gram inverted index for case-insensitive substring search.
+
+    Postings are append-only arrays of keys. Every candidate is verified
+    against the current text, so entries left behind by renames and deletes
+    are simply skipped instead of being removed from the postings.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.texts = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, key, text):
+        text = normalize(text)
+        if self.texts.get(key) == text:
+            return
+        self.texts[key] = text
+        for gram in ngrams(text, self.n):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('l')
+            posting.append(key)
+
+    def remove(self, key):
+        self.texts.pop(key, None)
+
+    def candidates(self, term):
+        if len(term) < self.n:
+            return self.texts
+        postings = [self.postings.get(gram) for gram in ngrams(term, self.n)]
+        if not all(postings):
+            return ()
+        return set(min(postings, key=len))
+
+    def search(self, term, limit=None):
+        """Return keys whose text contains `term`, best matches first.
+
+        Earlier matches rank higher, then shorter texts, then lower keys.
+        """
+        term = normalize(term)
+        texts = self.texts
+        ranked = (
+            (texts[key].find(term), len(texts[key]), key)
+            for key in self.candidates(term)
+            if key in texts and term in texts[key])
+        if limit is None:
+            ranked = sorted(ranked)
+        else:
+            ranked = heapq.nsmallest(limit, ranked)
+        return [key for position, length, key in ranked]
+
+
+WORD_START = re.compile(r'(?<=\W)\w')
+
+
+class PrefixIndex(object):
+    """Sorted arrays of normalized names for prefix lookups with bisect.
+
+    `starts` holds each whole name and `words` each suffix starting at a
+    later word, so "sax" finds "The Wild Sax Band". Entries are (text, key)
+    tuples; a lookup is two binary searches plus the k entries it returns.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.starts = []
+        self.words = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def entries(self, key, name):
+        text = normalize(name)
+        return [(self.starts, (text, key))] + [
+            (self.words, (text[match.start():], key)) for match in WORD_START.finditer(text)]
+
+    def add(self, key, name):
+        if key in self.names:
+            if self.names[key] == name:
+                return
+            self.remove(key)
+        self.names[key] = name
+        for entries, entry in self.entries(key, name):
+            bisect.insort(entries, entry)
+
+    def add_all(self, items):
+        # one sort instead of an insort per entry, for the initial load
+        for key, name in items:
+            self.remove(key)
+            self.names[key] = name
+            for entries, entry in self.entries(key, name):
+                entries.append(entry)
+        self.starts.sort()
+        self.words.sort()
+
+    def remove(self, key):
+        name = self.names.pop(key, None)
+        if name is None:
+            return
+        for entries, entry in self.entries(key, name):
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def complete(self, prefix, limit=10):
+        """Return up to `limit` (key, name) pairs whose name starts with
+        `prefix`, then those with a later word starting with it, each group
+        in name order."""
+        prefix = normalize(prefix).lstrip()
+        if not prefix:
+            return []
+        found = []
+        for entries in (self.starts, self.words):
+            position = bisect.bisect_left(entries, (prefix,))
+            while len(found) < limit and position < len(entries):
+                text, key = entries[position]
+                if not text.startswith(prefix):
+                    break
+                if key not in found:
+                    found.append(key)
+                position += 1
+        return [(key, self.names[key]) for key in found]
@@ -0,0 +1,30 @@
+import time
+
+
+class StartupTimer(object):
+    """Wall time of each startup phase, measured from construction.
+
+        startup = StartupTimer()
+        ...imports...
+        startup.mark('import')
+    """
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def time(self, phase, fn, *args, **kwargs):
+        self.last = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.mark(phase)
+        return result
+
+    def report(self):
+        lines = ['{:<12} {:8.1f}ms'.format(phase, seconds * 1000) for phase, seconds in self.phases]
+        lines.append('{:<12} {:8.1f}ms'.format('total', sum(seconds for _, seconds in self.phases) * 1000))
+        return '\n'.join(lines)
@@ -2,3 +2,32 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// typeahead for inputs with data-autocomplete="<endpoint>": fills the
+// input's datalist with matching names as options whose value is the id
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+  var options = document.getElementById(input.getAttribute('list'));
+  var latest = 0;
+  input.addEventListener('input', function () {
+    var term = input.value.trim();
+    var request = ++latest;
+    if (!term || /^\d+$/.test(term)) {
+      return;
+    }
+    fetch(input.dataset.autocomplete + '?q=' + encodeURIComponent(term))
+      .then(function (response) { return response.json(); })
+      .then(function (results) {
+        if (request !== latest) {
+          return;
+        }
+        options.innerHTML = '';
+        results.data.forEach(function (result) {
+          var option = document.createElement('option');
+          option.value = result.id;
+          option.label = result.name;
+          option.textContent = result.name;
+          options.appendChild(option);
+        });
+      });
+  });
+});